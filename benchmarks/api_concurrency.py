@@ -0,0 +1,80 @@
+"""
+Load test for the FastAPI endpoints under uvicorn, comparing the single
+thread-sensitive executor (API_SYNC_THREADS=0) with a thread pool.
+
+Fires concurrent requests at the read endpoints and reports throughput and
+latency percentiles for each executor configuration.
+
+Usage: python -m benchmarks.api_concurrency [--requests 2000] [--concurrency 32] [--threads 8]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import free_port, start, temporary_database, wait_until_up
+
+
+async def load(urls, requests, concurrency):
+    timings = []
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(urls[i % len(urls)])
+
+    async def worker(client):
+        while not queue.empty():
+            url = queue.get_nowait()
+            start_time = time.perf_counter()
+            response = await client.get(url)
+            response.raise_for_status()
+            timings.append((time.perf_counter() - start_time) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'rps': requests / elapsed,
+        'p50': statistics.median(timings),
+        'p95': timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def run(threads, requests, concurrency):
+    port = free_port()
+    server = start([sys.executable, '-m', 'uvicorn', 'project.api:app', '--port', str(port),
+                    '--log-level', 'warning'], env={'API_SYNC_THREADS': str(threads)})
+    try:
+        base = f'http://127.0.0.1:{port}'
+        wait_until_up(f'{base}/projects/list/')
+        project_ids = [p['id'] for p in httpx.get(f'{base}/projects/list/?fields=id&limit=50').json()['results']]
+        urls = [f'{base}/projects/list/?limit=50'] + [f'{base}/projects/{i}/photos/' for i in project_ids]
+        asyncio.run(load(urls, 50, concurrency))  # warm up
+        return asyncio.run(load(urls, requests, concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    with temporary_database():
+        for threads in (0, args.threads):
+            label = 'thread-sensitive executor' if threads == 0 else f'{threads}-thread pool'
+            stats = run(threads, args.requests, args.concurrency)
+            print(f"{label:<28} {stats['rps']:8.1f} req/s   p50 {stats['p50']:7.2f} ms   p95 {stats['p95']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
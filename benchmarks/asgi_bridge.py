@@ -0,0 +1,91 @@
+"""
+Compare the single-process ASGI setup (re_arqui.asgi, Django + FastAPI under
+uvicorn) against the two-process setup (Django WSGI under gunicorn plus the
+FastAPI app under its own uvicorn).
+
+Reports request latency percentiles for a Django page and an API endpoint,
+and the total resident memory of the server processes.
+
+Usage: python -m benchmarks.asgi_bridge [--requests 500]
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import free_port, process_tree_rss, start, temporary_database, wait_until_up
+
+
+def measure(url, requests):
+    timings = []
+    with httpx.Client() as client:
+        for _ in range(10):  # warm up
+            client.get(url)
+        for _ in range(requests):
+            start_time = time.perf_counter()
+            client.get(url).raise_for_status()
+            timings.append((time.perf_counter() - start_time) * 1000)
+    timings.sort()
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[int(len(timings) * 0.95) - 1],
+        'p99': timings[int(len(timings) * 0.99) - 1],
+    }
+
+
+def report(name, results, rss):
+    print(f"\n{name} (RSS {rss:.1f} MiB)")
+    for label, stats in results.items():
+        print(f"  {label:<20} p50 {stats['p50']:6.2f} ms   p95 {stats['p95']:6.2f} ms   p99 {stats['p99']:6.2f} ms")
+
+
+def run_single_process(requests):
+    port = free_port()
+    server = start([sys.executable, '-m', 'uvicorn', 're_arqui.asgi:application', '--port', str(port)])
+    try:
+        base = f'http://127.0.0.1:{port}'
+        wait_until_up(f'{base}/about/')
+        results = {
+            'django /about/': measure(f'{base}/about/', requests),
+            'api /projects/list/': measure(f'{base}/api/projects/list/', requests),
+        }
+        report("Single process (uvicorn re_arqui.asgi)", results, process_tree_rss(server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run_two_processes(requests):
+    django_port, api_port = free_port(), free_port()
+    django_server = start([sys.executable, '-m', 'gunicorn', 're_arqui.wsgi:application',
+                           '--bind', f'127.0.0.1:{django_port}'])
+    api_server = start([sys.executable, '-m', 'uvicorn', 'project.api:app', '--port', str(api_port)])
+    try:
+        wait_until_up(f'http://127.0.0.1:{django_port}/about/')
+        wait_until_up(f'http://127.0.0.1:{api_port}/projects/list/')
+        results = {
+            'django /about/': measure(f'http://127.0.0.1:{django_port}/about/', requests),
+            'api /projects/list/': measure(f'http://127.0.0.1:{api_port}/projects/list/', requests),
+        }
+        rss = process_tree_rss(django_server.pid) + process_tree_rss(api_server.pid)
+        report("Two processes (gunicorn WSGI + uvicorn FastAPI)", results, rss)
+    finally:
+        for server in (django_server, api_server):
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    with temporary_database():
+        run_single_process(args.requests)
+        run_two_processes(args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Helpers shared by the benchmark scripts: running servers against a throwaway
+copy of the database and measuring them.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@contextmanager
+def temporary_database():
+    """
+    Point every server started by start() at a migrated copy of db.sqlite3, so
+    benchmarks neither modify nor depend on the state of the real database.
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'db.sqlite3')
+    shutil.copy(os.path.join(BASE_DIR, 'db.sqlite3'), path)
+    previous = os.environ.get('SQLITE_PATH')
+    os.environ['SQLITE_PATH'] = path
+    try:
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+                       cwd=BASE_DIR, env=server_env(), check=True)
+        yield path
+    finally:
+        if previous is None:
+            os.environ.pop('SQLITE_PATH', None)
+        else:
+            os.environ['SQLITE_PATH'] = previous
+        shutil.rmtree(directory)
+
+
+def server_env(env=None):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='re_arqui.settings', **(env or {}))
+    env.setdefault('SECRET_KEY', 'benchmark')
+    return env
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(args, env=None):
+    return subprocess.Popen(args, cwd=BASE_DIR, env=server_env(env),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def process_tree_rss(pid):
+    """Resident memory in MiB of a process and all its descendants (Linux only)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
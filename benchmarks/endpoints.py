@@ -0,0 +1,333 @@
+"""
+In-process benchmark of the site's entry points on synthetic catalogs.
+
+Seeds a fresh SQLite database with a catalog of N projects (photos included)
+for each size, growing it between sizes, and measures each entry point there:
+the Django views through the test client and the FastAPI endpoints through
+httpx's ASGI transport. Reported per entry point: latency percentiles, the
+number of queries per request (on every thread, so the API's executor
+threads count too) and the peak Python memory allocated by one request.
+
+Results can be saved as a baseline and later checked against it: a run fails
+(exit status 1) when an entry point makes more queries than the baseline, or
+its p50/p95 latency or peak memory grows by more than --threshold. Latencies
+depend on the machine, so compare baselines recorded on the same hardware.
+
+Usage: python -m benchmarks.endpoints [--sizes 100 1000 10000] [--photos 20] [--requests 20]
+                                      [--save-baseline | --check] [--threshold 0.25]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from benchmarks.common import BASE_DIR, server_env
+
+BASELINE_PATH = os.path.join(BASE_DIR, 'benchmarks', 'endpoints_baseline.json')
+# Metrics checked against the baseline, besides the query count
+GROWTH_METRICS = ['p50', 'p95', 'peak_kib']
+
+
+class QueryCounter:
+    """Counts the queries run on every database connection, whatever its thread"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[max(0, int(len(timings) * 0.95) - 1)],
+        'p99': timings[max(0, int(len(timings) * 0.99) - 1)],
+    }
+
+
+class Benchmark:
+    def __init__(self, requests, photos_per_project, media_root):
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from django.db.backends.signals import connection_created
+        from rest_framework.authtoken.models import Token
+
+        self.requests = requests
+        self.photos_per_project = photos_per_project
+        self.media_root = media_root
+        self.queries = QueryCounter()
+        connection_created.connect(self.queries.install)
+        self.queries.install(connection)
+
+        user = User.objects.create_user('benchmark')
+        self.token = Token.objects.create(user=user).key
+        self.batches = 0
+
+    def seed(self, size):
+        """Grow the catalog to ``size`` projects with ``photos_per_project`` photos each"""
+        from django.db import transaction
+
+        from project.models import Photo, Project
+
+        start = Project.objects.count()
+        with transaction.atomic():
+            for offset in range(start, size, 1000):
+                projects = Project.objects.bulk_create([
+                    self.synthetic_project(i) for i in range(offset, min(size, offset + 1000))
+                ])
+                Photo.objects.bulk_create([
+                    self.synthetic_photo(project, index)
+                    for project in projects for index in range(self.photos_per_project)
+                ], batch_size=2000)
+
+    @staticmethod
+    def synthetic_project(i):
+        from project.models import Project
+
+        description = f'Descrição do projeto {i}.\n\nSegundo parágrafo.'
+        construction_year = None if i % 3 else 2000 + i % 25
+        project_year = 1987 + i % 38
+        return Project(
+            name=f'Projeto {i}', client=f'Cliente {i % 300}', site='Lisboa',
+            architect='Rita Dias, Nuno Félix', builder=f'Construtor {i % 50}',
+            description=description, description_html=Project.render_description(description),
+            project_year=project_year, construction_year=construction_year,
+            sort_year=Project.compute_sort_year(construction_year, project_year), public_private_project=i % 2,
+        )
+
+    @staticmethod
+    def synthetic_photo(project, index):
+        from project.models import Photo
+
+        name = f'project/photos/synthetic/{project.id}_{index}.jpg'
+        stem = name[:-4]
+        return Photo(
+            project=project, title=f'{project.name} {index}', index=index, is_cover_image=index == 0,
+            image=name, width=1600, height=1067, file_size=350_000, dominant_color='#785a3c',
+            blurhash='LEHV6nWB2yk8pyo0adR*.7kCMdnj',
+            renditions={'source': name, 'files': [
+                {'width': width, 'height': width * 2 // 3, 'format': fmt, 'name': f'{stem}_{width}.{ext}'}
+                for width in (480, 960) for fmt, ext in (('WEBP', 'webp'), ('JPEG', 'jpg'))
+            ]},
+        )
+
+    def measure(self, run, prepare=dict, cleanup=None):
+        """
+        Time ``requests`` calls of ``run`` (after a warm-up call), then trace one for
+        memory. ``prepare`` returns the keyword arguments of each call and ``cleanup``
+        gets its result; neither is measured.
+        """
+        def call(trace=False):
+            kwargs = prepare()
+            if trace:
+                tracemalloc.start()
+            before = self.queries.count
+            start = time.perf_counter()
+            try:
+                result = run(**kwargs)
+                sample = ((time.perf_counter() - start) * 1000, self.queries.count - before,
+                          tracemalloc.get_traced_memory()[1] if trace else 0)
+            finally:
+                if trace:
+                    tracemalloc.stop()
+            if cleanup:
+                cleanup(result)
+            return sample
+
+        call()
+        timings, queries, _ = zip(*(call() for _ in range(self.requests)))
+        peak = call(trace=True)[2]
+        return {**percentiles(timings), 'queries': max(queries), 'peak_kib': peak / 1024}
+
+    def run(self, size):
+        from django.core.cache import cache
+        from django.test import Client
+
+        from project.models import Project
+
+        client = Client()
+        project_id = Project.objects.order_by('id').values_list('id', flat=True)[size // 2]
+
+        def django_get(path, cached=False):
+            def run():
+                if not cached:
+                    cache.clear()
+                response = client.get(path)
+                assert response.status_code == 200, (path, response.status_code)
+            return run
+
+        results = {
+            'home': self.measure(django_get('/')),
+            'home (cached)': self.measure(django_get('/', cached=True)),
+            'project': self.measure(django_get(f'/project/{project_id}/')),
+        }
+        results.update(asyncio.run(self.run_api(project_id)))
+        return results
+
+    async def run_api(self, project_id):
+        import httpx
+
+        from project.api import app
+
+        transport = httpx.ASGITransport(app=app)
+        headers = {'Authorization': f'Bearer {self.token}'}
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver',
+                                     headers=headers, timeout=None) as client:
+            loop = asyncio.get_running_loop()
+
+            def call(method, path):
+                async def request(**kwargs):
+                    response = await client.request(method, path, **kwargs)
+                    assert response.status_code == 200, (path, response.status_code, response.text)
+                    return response.json()
+
+                # measure() is synchronous; drive each request from a worker thread
+                return lambda **kwargs: asyncio.run_coroutine_threadsafe(request(**kwargs), loop).result()
+
+            measure = lambda *args: loop.run_in_executor(None, self.measure, *args)
+            return {
+                'list_projects': await measure(call('GET', '/projects/list/?limit=50')),
+                'project_photos': await measure(call('GET', f'/projects/{project_id}/photos/?limit=24')),
+                'import_projects_csv': await measure(
+                    call('POST', '/projects/import-csv/'),
+                    lambda: {'files': {'file': ('projects.csv', self.csv_file(50), 'text/csv')}},
+                    self.delete_imported,
+                ),
+                'create_photos_batch': await measure(
+                    call('POST', '/photos/batch/?wait=true'),
+                    lambda: {'json': self.photo_batch(project_id, 5)},
+                    self.delete_batch,
+                ),
+            }
+
+    @staticmethod
+    def csv_file(rows):
+        text = io.StringIO()
+        text.write('name,description,client,project_year,architect,builder,site\n')
+        for i in range(rows):
+            text.write(f'Importado {i},"Descrição {i}\nSegunda linha",Cliente {i},2020,Arquiteto,Construtor,Porto\n')
+        return text.getvalue().encode('utf-8')
+
+    def photo_batch(self, project_id, count):
+        """Items for a batch of ``count`` new images, so every batch stores and reads fresh files"""
+        from PIL import Image
+
+        self.batches += 1
+        items = []
+        for i in range(count):
+            path = os.path.join(self.media_root, 'sources', f'{self.batches}_{i}.jpg')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            colour = (self.batches * 7 % 256, i * 20 % 256, 90)
+            Image.new('RGB', (1200, 800), colour).save(path, 'JPEG')
+            items.append({'title': f'Lote {self.batches} {i}', 'project_id': project_id, 'image_path': path})
+        return items
+
+    # Keep the catalog at its nominal size between write requests
+
+    @staticmethod
+    def delete_imported(result):
+        from project.models import Project
+        Project.objects.filter(id__in=result['project_ids']).delete()
+
+    @staticmethod
+    def delete_batch(response):
+        from project.models import Photo
+        assert not response['errors'], response['errors']
+        Photo.objects.filter(id__in=[result['id'] for result in response['results']]).delete()
+
+
+def setup_django(directory):
+    """Configure Django in this process against a new, migrated database in ``directory``"""
+    os.environ.update(server_env({'SQLITE_PATH': os.path.join(directory, 'db.sqlite3'), 'DJANGO_DEBUG': '0'}))
+    sys.path.insert(0, BASE_DIR)
+
+    import django
+    from django.core.management import call_command
+    from django.test.utils import override_settings, setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    override_settings(MEDIA_ROOT=os.path.join(directory, 'media')).enable()
+    call_command('migrate', verbosity=0)
+
+
+def check(results, baseline, threshold):
+    """Regressions of ``results`` against ``baseline``, as printable lines"""
+    regressions = []
+    for size, entries in results.items():
+        for name, stats in entries.items():
+            expected = baseline.get(size, {}).get(name)
+            if expected is None:
+                continue
+            if stats['queries'] > expected['queries']:
+                regressions.append(f"{size} projects, {name}: {stats['queries']} queries "
+                                   f"(baseline {expected['queries']})")
+            for metric in GROWTH_METRICS:
+                if stats[metric] > expected[metric] * (1 + threshold):
+                    regressions.append(f"{size} projects, {name}: {metric} {stats[metric]:.2f} "
+                                       f"(baseline {expected[metric]:.2f}, +{threshold:.0%} allowed)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--photos', type=int, default=20, help="Photos per project")
+    parser.add_argument('--requests', type=int, default=20, help="Timed requests per entry point")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save-baseline', action='store_true')
+    mode.add_argument('--check', action='store_true', help="Exit with status 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed relative growth (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        setup_django(directory)
+        benchmark = Benchmark(args.requests, args.photos, os.path.join(directory, 'media'))
+        results = {}
+        for size in sorted(args.sizes):
+            started = time.perf_counter()
+            benchmark.seed(size)
+            print(f"\n{size} projects, {size * args.photos} photos (seeded in {time.perf_counter() - started:.1f}s)")
+            results[str(size)] = benchmark.run(size)
+            for name, stats in results[str(size)].items():
+                print(f"  {name:<22} p50 {stats['p50']:8.2f} ms   p95 {stats['p95']:8.2f} ms   "
+                      f"p99 {stats['p99']:8.2f} ms   {stats['queries']:3} queries   "
+                      f"peak {stats['peak_kib']:9.1f} KiB")
+    finally:
+        shutil.rmtree(directory)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline saved to {args.baseline}")
+    elif args.check:
+        with open(args.baseline) as f:
+            regressions = check(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrency benchmark for the SQLite database profiles.
+
+Runs the site under gunicorn and the API under uvicorn, as separate processes
+sharing one database, and drives a mix of Django page reads and API writes
+against them, for the stock Django SQLite settings (DB_PROFILE=basic) and the
+tuned production profile. Reports throughput, latency and failed requests,
+which are mostly "database is locked" errors.
+
+Usage: python -m benchmarks.sqlite_concurrency [--requests 1000] [--concurrency 16] [--write-ratio 0.3]
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import BASE_DIR, free_port, server_env, start, temporary_database, wait_until_up
+
+CREATE_TOKEN = (
+    "from django.contrib.auth.models import User;"
+    "from rest_framework.authtoken.models import Token;"
+    "user, _ = User.objects.get_or_create(username='benchmark');"
+    "print(Token.objects.get_or_create(user=user)[0].key)"
+)
+
+
+async def drive(site, api, token, project_ids, requests, concurrency, write_ratio):
+    counter = itertools.count()
+    timings = {'read': [], 'write': []}
+    failures = {'read': 0, 'write': 0}
+
+    async def worker(client):
+        while (i := next(counter)) < requests:
+            kind = 'write' if random.random() < write_ratio else 'read'
+            start_time = time.perf_counter()
+            if kind == 'write':
+                response = await client.put(f'{api}/projects/{random.choice(project_ids)}/',
+                                            json={'other': f'benchmark {i}'},
+                                            headers={'Authorization': f'Bearer {token}'})
+            else:
+                # A unique query string bypasses the page cache so every read hits the database
+                response = await client.get(f'{site}/?r={i}')
+            timings[kind].append((time.perf_counter() - start_time) * 1000)
+            if response.status_code >= 400:
+                failures[kind] += 1
+
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=concurrency)) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return elapsed, timings, failures
+
+
+def run(profile, args):
+    env = {'DB_PROFILE': profile}
+    token = subprocess.run([sys.executable, 'manage.py', 'shell', '-c', CREATE_TOKEN], cwd=BASE_DIR,
+                           env=server_env(env), check=True, capture_output=True, text=True).stdout.strip()
+
+    site_port, api_port = free_port(), free_port()
+    site_server = start([sys.executable, '-m', 'gunicorn', 're_arqui.wsgi:application',
+                         '--bind', f'127.0.0.1:{site_port}', '--workers', '2', '--threads', '4'], env=env)
+    api_server = start([sys.executable, '-m', 'uvicorn', 'project.api:app', '--port', str(api_port),
+                        '--log-level', 'warning'], env=env)
+    try:
+        site, api = f'http://127.0.0.1:{site_port}', f'http://127.0.0.1:{api_port}'
+        wait_until_up(f'{site}/about/')
+        wait_until_up(f'{api}/projects/list/')
+        project_ids = [p['id'] for p in httpx.get(f'{api}/projects/list/?fields=id&limit=500').json()['results']]
+        if not project_ids:
+            raise RuntimeError("The database has no projects to update")
+
+        elapsed, timings, failures = asyncio.run(
+            drive(site, api, token, project_ids, args.requests, args.concurrency, args.write_ratio)
+        )
+    finally:
+        for server in (site_server, api_server):
+            server.terminate()
+            server.wait()
+
+    print(f"\n{profile} profile: {args.requests / elapsed:.1f} req/s")
+    for kind in ('read', 'write'):
+        values = sorted(timings[kind])
+        if values:
+            print(f"  {kind:<6} {len(values):5d} requests   p50 {statistics.median(values):7.2f} ms   "
+                  f"p95 {values[int(len(values) * 0.95) - 1]:7.2f} ms   failed {failures[kind]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    args = parser.parse_args()
+
+    for profile in ('basic', 'production'):
+        with temporary_database():
+            run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
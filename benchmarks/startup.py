@@ -0,0 +1,179 @@
+"""
+Cold-start profile of the entry points, to track worker spawn and Passenger
+restart latency.
+
+Each entry point is started in a fresh interpreter under ``python -X importtime``
+several times: passenger_wsgi (the WSGI application Passenger loads), the
+FastAPI app and the combined ASGI application. Reported per entry point (the
+median of the runs): process wall time, time to import the entry point, time
+to serve its first request, and the packages whose modules take the most time
+to import along the way (their own import time, excluding what they import).
+
+Like benchmarks.endpoints, results can be saved as a baseline and checked
+against it with a relative --threshold.
+
+Usage: python -m benchmarks.startup [--runs 5] [--top 10] [--save-baseline | --check] [--threshold 0.25]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BASE_DIR, server_env, temporary_database
+
+BASELINE_PATH = os.path.join(BASE_DIR, 'benchmarks', 'startup_baseline.json')
+GROWTH_METRICS = ['wall_ms', 'import_ms', 'first_request_ms']
+
+# Run in the child interpreter: import the entry point, serve one request and print the
+# timings. The lines written to stderr around them delimit the imports that are counted.
+MARKER = '-- startup benchmark'
+
+WSGI_SCRIPT = """
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+marker, path = sys.argv[1:]
+print(marker, file=sys.stderr, flush=True)
+start = time.perf_counter()
+from passenger_wsgi import application
+imported = time.perf_counter()
+environ = {'PATH_INFO': path}
+setup_testing_defaults(environ)
+b''.join(application(environ, lambda status, headers: None))
+done = time.perf_counter()
+print(marker, file=sys.stderr, flush=True)
+print(json.dumps({'import': imported - start, 'first_request': done - imported}))
+"""
+
+# A single GET driven straight through the ASGI interface, to keep a test client's imports out
+ASGI_SCRIPT = """
+import asyncio, importlib, json, sys, time
+marker, target, path, query = sys.argv[1:]
+
+async def get(application):
+    messages, requests = [], [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    async def receive():
+        return requests.pop() if requests else {'type': 'http.disconnect'}
+    async def send(message):
+        messages.append(message)
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+             'root_path': '', 'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 0),
+             'server': ('localhost', 80)}
+    await application(scope, receive, send)
+    assert messages[0]['status'] == 200, messages[0]
+
+module, name = target.split(':')
+print(marker, file=sys.stderr, flush=True)
+start = time.perf_counter()
+application = getattr(importlib.import_module(module), name)
+imported = time.perf_counter()
+asyncio.run(get(application))
+done = time.perf_counter()
+print(marker, file=sys.stderr, flush=True)
+print(json.dumps({'import': imported - start, 'first_request': done - imported}))
+"""
+
+# Entry point: (script, arguments)
+ENTRY_POINTS = {
+    'passenger_wsgi': (WSGI_SCRIPT, ['/about/']),
+    'project.api': (ASGI_SCRIPT, ['project.api:app', '/projects/list/', 'limit=1']),
+    're_arqui.asgi': (ASGI_SCRIPT, ['re_arqui.asgi:application', '/about/', '']),
+}
+
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_once(script, arguments):
+    """Timings of one cold start, and the self/cumulative import time (µs) of each module"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script, MARKER, *arguments], cwd=BASE_DIR,
+                            env=server_env({'DJANGO_DEBUG': '0'}), capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+
+    modules = {}
+    profiled = result.stderr.split(MARKER)[1]
+    for line in profiled.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            modules[match[4]] = (int(match[1]), int(match[2]))
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {'wall_ms': wall * 1000, 'import_ms': timings['import'] * 1000,
+            'first_request_ms': timings['first_request'] * 1000}, modules
+
+
+def profile(entry_point, runs, top):
+    samples, module_runs = [], []
+    for _ in range(runs):
+        timings, modules = run_once(*entry_point)
+        samples.append(timings)
+        module_runs.append(modules)
+
+    result = {metric: statistics.median(sample[metric] for sample in samples) for metric in GROWTH_METRICS}
+    # Packages by total self time: the cost of importing them, whoever imports them first
+    packages = {}
+    for name in module_runs[0]:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + statistics.median(
+            modules.get(name, (0, 0))[0] for modules in module_runs
+        )
+    result['top_packages'] = {package: round(self_time / 1000, 1) for package, self_time in
+                              sorted(packages.items(), key=lambda item: -item[1])[:top]}
+    return result
+
+
+def check(results, baseline, threshold):
+    """Regressions of ``results`` against ``baseline``, as printable lines"""
+    regressions = []
+    for name, stats in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric in GROWTH_METRICS:
+            if stats[metric] > expected[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {stats[metric]:.1f} "
+                                   f"(baseline {expected[metric]:.1f}, +{threshold:.0%} allowed)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="Packages listed per entry point")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save-baseline', action='store_true')
+    mode.add_argument('--check', action='store_true', help="Exit with status 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed relative growth (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = {}
+    with temporary_database():
+        for name, entry_point in ENTRY_POINTS.items():
+            results[name] = result = profile(entry_point, args.runs, args.top)
+            print(f"\n{name}: wall {result['wall_ms']:.0f} ms   import {result['import_ms']:.0f} ms   "
+                  f"first request {result['first_request_ms']:.0f} ms")
+            for package, self_time in result['top_packages'].items():
+                print(f"  {package:<28} {self_time:7.1f} ms")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline saved to {args.baseline}")
+    elif args.check:
+        with open(args.baseline) as f:
+            regressions = check(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
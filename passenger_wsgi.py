@@ -1,8 +1,6 @@
-import imp
 import os
 import sys
 
 sys.path.insert(0, os.path.dirname(__file__))
 
-wsgi = imp.load_source('wsgi', 're_arqui/wsgi.py')
-application = wsgi.application
\ No newline at end of file
+from re_arqui.wsgi import application  # noqa: E402
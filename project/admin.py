@@ -1,19 +1,123 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
+
 from .models import Project, Photo
+from .search import filter_projects
+
+# Query parameter of the change form selecting the page of the photo inline
+PHOTO_PAGE_PARAM = 'photos_page'
+
+@admin.display(description='Preview')
+def thumbnail(photo):
+    # The smallest rendition, never the original upload
+    url = photo.thumbnail_url
+    if not url:
+        return '-'
+    return format_html('<img src="{}" alt="" width="80" loading="lazy" style="height: auto; background-color: {}">',
+                       url, photo.dominant_color or 'transparent')
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset editing one page of the related objects at a time"""
+    per_page = 25
+    query = {}
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self.paginator = Paginator(super().get_queryset(), self.per_page)
+            self.page = self.paginator.get_page(self.query.get(PHOTO_PAGE_PARAM))
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def page_links(self):
+        """(number, URL) of the pages around the current one; the URL is None for ellipses"""
+        self.get_queryset()
+        query = self.query.copy()
+        links = []
+        for number in self.paginator.get_elided_page_range(self.page.number):
+            if number == self.paginator.ELLIPSIS:
+                links.append((number, None))
+            else:
+                query[PHOTO_PAGE_PARAM] = number
+                links.append((number, f'?{query.urlencode()}'))
+        return links
 
 class PhotoInline(admin.TabularInline):
     model = Photo
+    formset = PaginatedInlineFormSet
+    template = 'admin/project/photo_inline.html'
+    fields = (thumbnail, 'title', 'image', 'index', 'is_cover_image')
+    readonly_fields = (thumbnail,)
+    ordering = ('index', 'id')
     extra = 1
+    per_page = 25
+    show_change_link = True
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.query = request.GET
+        return formset
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ('name', 'architect', 'client', 'project_year', 'construction_year')
+    list_display = ('name', 'architect', 'client', 'project_year', 'construction_year', 'photo_count')
+    # Searched through the FTS5 index (project/search.py), over more than these fields
     search_fields = ('name', 'architect', 'client')
     list_filter = ('project_year', 'construction_year')
+    # The changelist's default, made explicit so the photo form's autocomplete pages consistently
+    ordering = ('-id',)
     inlines = [PhotoInline]
 
+    def get_queryset(self, request):
+        # A correlated count over photo_project_index_idx, run for the listed page only,
+        # rather than grouping every photo of the catalog
+        photo_count = Photo.objects.filter(project=OuterRef('pk')).values('project').annotate(
+            count=Count('*')).values('count')
+        return super().get_queryset(request).annotate(
+            photo_count=Coalesce(Subquery(photo_count, output_field=IntegerField()), 0))
+
+    @admin.display(description='Photos', ordering='photo_count')
+    def photo_count(self, project):
+        url = reverse('admin:project_photo_changelist')
+        return format_html('<a href="{}?project__id__exact={}">{}</a>', url, project.pk, project.photo_count)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return filter_projects(queryset, search_term), False
+
+class ProjectFilter(admin.SimpleListFilter):
+    """
+    Photos of one project. Only the selected project is listed rather than the whole
+    catalog; it's selected from the photo counts of the project list.
+    """
+    title = 'project'
+    parameter_name = 'project__id__exact'
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value or not value.isdigit():
+            return []
+        return [(str(pk), name) for pk, name in Project.objects.filter(pk=value).values_list('pk', 'name')]
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(project_id=value)
+        return queryset
+
 @admin.register(Photo)
 class PhotoAdmin(admin.ModelAdmin):
-    list_display = ('title', 'project', 'is_cover_image', 'index')
-    list_filter = ('project', 'is_cover_image')
+    list_display = (thumbnail, 'title', 'project', 'is_cover_image', 'index')
+    list_select_related = ('project',)
+    list_filter = (ProjectFilter, 'is_cover_image')
     search_fields = ('title', 'project__name')
+    autocomplete_fields = ('project',)
+    readonly_fields = (thumbnail,)
+    # Skip counting the whole table when the list is filtered
+    show_full_result_count = False
@@ -1,23 +1,29 @@
 import os
-import django
+
+import re_arqui
 
 # Set up Django before importing models
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "re_arqui.settings")
-django.setup()
+re_arqui.setup()
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, status, Header, Body
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, status, Header, Body, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Optional
-import json
-from io import StringIO
+import base64
 from pydantic import BaseModel
-from django.core.files import File as DjangoFile
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.files import File as DjangoFile
 from asgiref.sync import sync_to_async
-import shutil
 
 # Import models from Django
 from .models import Project, Photo
+from .auth import get_user_from_token, token_cache
+from .cache import bump_content_version
+from .executor import run_sync
+from .jobs import job_status
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, ASGIMetricsMiddleware, render_metrics
+from .renditions import rendition_urls
+from .search import search as search_index
 
 # Check if we're in production by looking for the production settings module
 is_production = os.environ.get("DJANGO_SETTINGS_MODULE") == "re_arqui.settings_prod"
@@ -36,6 +42,18 @@ app = FastAPI(
 # Authentication scheme
 security = HTTPBearer()
 
+@app.middleware("http")
+async def invalidate_page_cache(request: Request, call_next):
+    # Writes that bypass model signals (bulk imports, queryset updates) still
+    # need the public pages to be re-rendered
+    response = await call_next(request)
+    if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        bump_content_version()
+    return response
+
+# Added last, so it wraps the other middleware and times whole requests
+app.add_middleware(ASGIMetricsMiddleware)
+
 # Pydantic models for API
 class ProjectBase(BaseModel):
     name: str
@@ -62,6 +80,8 @@ class ProjectUpdate(ProjectBase):
 
 class ProjectResponse(ProjectBase):
     id: int
+    # description rendered as HTML paragraphs
+    description_html: str = ""
     
     class Config:
         from_attributes = True
@@ -72,26 +92,33 @@ class PhotoBase(BaseModel):
     is_cover_image: bool = False
     project_id: int
 
+class RenditionResponse(BaseModel):
+    width: int
+    height: int
+    format: str
+    url: str
+
 class PhotoResponse(PhotoBase):
     id: int
     image_url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    file_size: Optional[int] = None
+    dominant_color: str = ""
+    blurhash: str = ""
+    srcset: Optional[str] = None
+    renditions: List[RenditionResponse] = []
     
     class Config:
         from_attributes = True
 
-# Synchronous function to get a user from token
-def get_user_from_token(token_value):
-    from rest_framework.authtoken.models import Token
-    try:
-        token_obj = Token.objects.get(key=token_value)
-        return token_obj.user
-    except Exception as e:
-        return None
-
 # Authentication dependency
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token_value = credentials.credentials
-    user = await sync_to_async(get_user_from_token)(token_value)
+    # Cached tokens are resolved without a threadpool hop
+    user = token_cache.get(token_value)
+    if user is None:
+        user = await run_sync(get_user_from_token)(token_value)
     
     if not user:
         raise HTTPException(
@@ -101,38 +128,127 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     return user
 
+class ProjectPage(BaseModel):
+    results: List[dict]
+    next_cursor: Optional[str] = None
+
+class ProjectSearchPage(BaseModel):
+    total: int
+    results: List[ProjectResponse]
+    next_offset: Optional[int] = None
+
+PROJECT_FIELDS = list(ProjectResponse.model_fields)
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 # Routes that don't require authentication
-@app.get("/projects/list/", response_model=List[ProjectResponse])
-async def list_projects():
-    projects = await sync_to_async(list)(Project.objects.all())
-    return projects
+@app.get("/projects/list/", response_model=ProjectPage)
+async def list_projects(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    public_private_project: Optional[int] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None
+):
+    """
+    List projects ordered by id, a page at a time. Pass the returned next_cursor to get
+    the following page. fields=name,architect limits the columns returned (id is always
+    included); year_from/year_to filter on the construction year, or the project year
+    when there is none.
+    """
+    selected = PROJECT_FIELDS
+    if fields:
+        selected = ['id'] + [f.strip() for f in fields.split(',') if f.strip() and f.strip() != 'id']
+        unknown = [f for f in selected if f not in PROJECT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    
+    projects = Project.objects.order_by('id')
+    if cursor:
+        projects = projects.filter(id__gt=decode_cursor(cursor))
+    if public_private_project is not None:
+        projects = projects.filter(public_private_project=public_private_project)
+    if year_from is not None or year_to is not None:
+        # The stored sort_year is the construction year, or else the project year, or 0
+        # when there is neither; projects without a year never match a year range
+        if year_from is not None:
+            projects = projects.filter(sort_year__gte=year_from)
+        if year_to is not None:
+            projects = projects.filter(sort_year__lte=year_to)
+        if (year_from is None or year_from <= 0) and (year_to is None or year_to >= 0):
+            projects = projects.exclude(construction_year=None, project_year=None)
+    
+    # Fetch one extra row to know whether there is a next page
+    rows = await run_sync(list)(projects.values(*selected)[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]['id']) if len(rows) > limit else None
+    return {"results": rows[:limit], "next_cursor": next_cursor}
 
-@app.get("/projects/{project_id}/photos/", response_model=List[PhotoResponse])
-async def get_project_photos(project_id: int):
-    @sync_to_async
-    def get_photos():
-        try:
-            project = Project.objects.get(id=project_id)
-            photos = project.photo_set.all()
-            
-            # Manually construct response with image URLs
-            result = []
-            for photo in photos:
-                photo_data = {
-                    "id": photo.id,
-                    "title": photo.title,
-                    "index": photo.index,
-                    "is_cover_image": photo.is_cover_image,
-                    "project_id": photo.project_id,
-                    "image_url": photo.image.url if photo.image else None
-                }
-                result.append(photo_data)
-            
-            return result
-        except Project.DoesNotExist:
-            return None
+def search_page(query, offset, limit):
+    """One page of projects matching ``query`` in rank order, and the total number of matches"""
+    ids, total = search_index(query, offset, limit)
+    projects = Project.objects.in_bulk(ids)
+    return [projects[i] for i in ids if i in projects], total
+
+@app.get("/projects/search/", response_model=ProjectSearchPage)
+async def search_projects(
+    q: str = Query(..., min_length=1),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    Projects whose name, description, client, architect, builder or site contain every
+    word of q (as word prefixes, accents ignored), best matches first. Pass next_offset
+    back as offset to get the following page.
+    """
+    results, total = await run_sync(search_page)(q, offset, limit)
+    next_offset = offset + limit if offset + limit < total else None
+    return {"total": total, "results": results, "next_offset": next_offset}
+
+def project_photos(project_id, offset=0, limit=None):
+    """Photos of a project in gallery order as response dicts, or None if the project doesn't exist"""
+    if not Project.objects.filter(id=project_id).exists():
+        return None
+    
+    photos = Photo.objects.filter(project_id=project_id).order_by('index', 'id')
+    photos = photos[offset:offset + limit] if limit is not None else photos[offset:]
     
-    photos = await get_photos()
+    # Manually construct response with image URLs
+    result = []
+    for photo in photos:
+        result.append({
+            "id": photo.id,
+            "title": photo.title,
+            "index": photo.index,
+            "is_cover_image": photo.is_cover_image,
+            "project_id": photo.project_id,
+            "image_url": photo.image.url if photo.image else None,
+            "width": photo.width,
+            "height": photo.height,
+            "file_size": photo.file_size,
+            "dominant_color": photo.dominant_color,
+            "blurhash": photo.blurhash,
+            "srcset": photo.srcset if photo.image else None,
+            "renditions": rendition_urls(photo.renditions, photo.image.storage)
+        })
+    return result
+
+@app.get("/projects/{project_id}/photos/", response_model=List[PhotoResponse])
+async def get_project_photos(
+    project_id: int,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Photos in gallery order (by index); pass offset/limit to get them a page at a time"""
+    photos = await run_sync(project_photos)(project_id, offset, limit)
     if photos is None:
         raise HTTPException(status_code=404, detail="Project not found")
     return photos
@@ -140,23 +256,38 @@ async def get_project_photos(project_id: int):
 # Routes that require authentication
 @app.post("/project/", response_model=ProjectResponse)
 async def create_project(project: ProjectCreate, user: User = Depends(get_current_user)):
-    @sync_to_async
-    def create_project_sync():
-        return Project.objects.create(
-            name=project.name,
-            description=project.description,
-            client=project.client,
-            project_year=project.project_year,
-            construction_year=project.construction_year,
-            architect=project.architect,
-            builder=project.builder,
-            site=project.site,
-            public_private_project=project.public_private_project,
-            other=project.other
-        )
+    return await Project.objects.acreate(**project.model_dump())
+
+def save_uploaded_photo(project_id, title, is_cover_image, index, upload, filename):
+    try:
+        project = Project.objects.get(id=project_id)
+    except Project.DoesNotExist:
+        return None
+    
+    photo = Photo(
+        title=title,
+        project=project,
+        is_cover_image=is_cover_image,
+        index=index
+    )
     
-    new_project = await create_project_sync()
-    return new_project
+    # Store the file first so the photo is written with a single INSERT. Storage is
+    # content-addressed, so a file that's already stored isn't written again.
+    content = DjangoFile(upload, filename)
+    photo.image.name, created, digest = photo.image.storage.store(
+        photo.image.field.generate_filename(photo, filename), content
+    )
+    photo.save()
+    
+    return {
+        "id": photo.id,
+        "title": photo.title,
+        "image_url": photo.image.url,
+        "srcset": photo.srcset,
+        "size": content.size,
+        "sha256": digest,
+        "deduplicated": not created
+    }
 
 @app.post("/photos/")
 async def create_photo(
@@ -167,121 +298,43 @@ async def create_photo(
     image: UploadFile = File(...),
     user: User = Depends(get_current_user)
 ):
-    # Read file content
-    content = await image.read()
-    filename = image.filename
-    
-    @sync_to_async
-    def create_photo_sync():
-        try:
-            project = Project.objects.get(id=project_id)
-            
-            # Create a temporary file to save the uploaded file
-            import tempfile
-            import os
-            
-            temp_file = tempfile.NamedTemporaryFile(delete=False)
-            try:
-                # Write content to temporary file
-                temp_file.write(content)
-                temp_file.flush()
-                
-                # Create Photo with Django File
-                photo = Photo.objects.create(
-                    title=title,
-                    project=project,
-                    is_cover_image=is_cover_image,
-                    index=index
-                )
-                
-                # Open the temporary file and assign it to the ImageField
-                with open(temp_file.name, 'rb') as f:
-                    photo.image.save(filename, DjangoFile(f), save=True)
-                    
-                return {"id": photo.id, "title": photo.title, "image_url": photo.image.url}
-            finally:
-                temp_file.close()
-                os.unlink(temp_file.name)
-                
-        except Project.DoesNotExist:
-            return None
-    
-    result = await create_photo_sync()
+    # The upload is already spooled by the multipart parser; stream it into storage
+    # in chunks instead of reading it into memory and through another temp file
+    result = await run_sync(save_uploaded_photo)(
+        project_id, title, is_cover_image, index, image.file, image.filename
+    )
     if result is None:
         raise HTTPException(status_code=404, detail="Project not found")
     return result
 
 @app.post("/photos/batch/")
-async def create_photos_batch(photos_data: List[dict] = Body(...), user: User = Depends(get_current_user)):
+async def create_photos_batch(
+    photos_data: List[dict] = Body(...),
+    wait: bool = False,
+    user: User = Depends(get_current_user)
+):
     """
     Upload multiple photos at once from local file paths.
+
+    The photos are processed in parallel by the background worker pool and a job id is
+    returned immediately; poll /photos/batch/{job_id}/ for per-item progress. Pass
+    ?wait=true to block until the batch is done and get the results directly. The
+    photos are saved together once every item has been processed.
     """
-    @sync_to_async
-    def process_photos_sync(photos_data):
-        results = []
-        errors = []
-        
-        for i, photo_data in enumerate(photos_data):
-            try:
-                # Check if required fields exist
-                if not all(key in photo_data for key in ["title", "image_path"]):
-                    errors.append({"index": i, "error": "Missing required fields: title, image_path"})
-                    continue
-                
-                # Find project - first look by name in catalog field if provided
-                project = None
-                if "catalog" in photo_data and photo_data["catalog"]:
-                    try:
-                        project = Project.objects.get(name=photo_data["catalog"])
-                    except Project.DoesNotExist:
-                        pass
-                
-                # If no project found by catalog, use project_id if provided
-                if project is None and "project_id" in photo_data and photo_data["project_id"]:
-                    try:
-                        project = Project.objects.get(id=photo_data["project_id"])
-                    except Project.DoesNotExist:
-                        errors.append({"index": i, "error": f"Project not found: {photo_data.get('catalog', '')} or ID: {photo_data.get('project_id', '')}"})
-                        continue
-                
-                if project is None:
-                    errors.append({"index": i, "error": "No valid project specified. Provide either catalog (project name) or project_id"})
-                    continue
-                
-                # Check if image path exists
-                image_path = photo_data["image_path"]
-                if not os.path.exists(image_path):
-                    errors.append({"index": i, "error": f"Image file not found: {image_path}"})
-                    continue
-                
-                # Create photo object
-                photo = Photo.objects.create(
-                    title=photo_data["title"],
-                    project=project,
-                    is_cover_image=photo_data.get("is_cover_image", False),
-                    index=photo_data.get("index", None)
-                )
-                
-                # Copy the image file to Django's media storage
-                with open(image_path, 'rb') as src_file:
-                    filename = os.path.basename(image_path)
-                    photo.image.save(filename, DjangoFile(src_file), save=True)
-                
-                results.append({
-                    "id": photo.id,
-                    "title": photo.title,
-                    "project_id": project.id,
-                    "project_name": project.name,
-                    "image_url": photo.image.url
-                })
-                
-            except Exception as e:
-                errors.append({"index": i, "error": str(e)})
-        
-        return {"results": results, "errors": errors}
+    from .photo_import import start_photo_batch
+    job = await run_sync(start_photo_batch)(photos_data)
     
-    result = await process_photos_sync(photos_data)
-    return result
+    if wait:
+        await sync_to_async(job.wait, thread_sensitive=False)()
+        return job.results()
+    return {"job_id": job.id, "status": job.status, "total": len(photos_data)}
+
+@app.get("/photos/batch/{job_id}/")
+async def get_photos_batch_status(job_id: str, user: User = Depends(get_current_user)):
+    status = await run_sync(job_status)(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return status
 
 @app.put("/projects/{project_id}/", response_model=ProjectResponse)
 async def update_project(
@@ -289,49 +342,32 @@ async def update_project(
     project_update: ProjectUpdate, 
     user: User = Depends(get_current_user)
 ):
-    @sync_to_async
-    def update_project_sync():
-        try:
-            project = Project.objects.get(id=project_id)
-            
-            # Update fields if provided
-            update_data = project_update.dict(exclude_unset=True)
-            for key, value in update_data.items():
-                setattr(project, key, value)
-            
-            project.save()
-            return project
-        except Project.DoesNotExist:
-            return None
-    
-    updated_project = await update_project_sync()
-    if updated_project is None:
+    try:
+        project = await Project.objects.aget(id=project_id)
+    except Project.DoesNotExist:
         raise HTTPException(status_code=404, detail="Project not found")
-    return updated_project
+    
+    # Update fields if provided
+    update_data = project_update.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(project, key, value)
+    
+    await project.asave()
+    return project
 
 @app.delete("/projects/delete/")
 async def delete_all_projects(user: User = Depends(get_current_user)):
-    @sync_to_async
-    def delete_all_sync():
-        return Project.objects.all().delete()
-    
-    await delete_all_sync()
+    await Project.objects.all().adelete()
     return {"message": "All projects deleted successfully"}
 
 @app.delete("/projects/delete/{project_id}/")
 async def delete_project(project_id: int, user: User = Depends(get_current_user)):
-    @sync_to_async
-    def delete_project_sync():
-        try:
-            project = Project.objects.get(id=project_id)
-            project.delete()
-            return True
-        except Project.DoesNotExist:
-            return False
-    
-    success = await delete_project_sync()
-    if not success:
+    try:
+        project = await Project.objects.aget(id=project_id)
+    except Project.DoesNotExist:
         raise HTTPException(status_code=404, detail="Project not found")
+    
+    await project.adelete()
     return {"message": f"Project {project_id} deleted successfully"}
 
 # CSV Import/Export functionality simplified without pandas
@@ -340,173 +376,46 @@ async def import_projects_csv(
     file: UploadFile = File(...),
     user: User = Depends(get_current_user)
 ):
-    contents = await file.read()
-    csv_string = contents.decode('utf-8')
-    
-    @sync_to_async
-    def import_csv_sync():
-        try:
-            # Define a custom CSV parser function
-            def parse_csv_line(line):
-                result = []
-                current_field = ""
-                in_quotes = False
-                i = 0
-                
-                while i < len(line):
-                    char = line[i]
-                    
-                    # Handle quotes
-                    if char == '"':
-                        # Toggle quote state
-                        in_quotes = not in_quotes
-                        
-                        # Handle escaped quotes (double quotes)
-                        if i + 1 < len(line) and line[i+1] == '"':
-                            current_field += '"'
-                            i += 2
-                            continue
-                    
-                    # Handle commas
-                    elif char == ',' and not in_quotes:
-                        # End of field
-                        result.append(current_field)
-                        current_field = ""
-                        i += 1
-                        continue
-                    
-                    # Add character to current field
-                    current_field += char
-                    i += 1
-                
-                # Add the last field
-                result.append(current_field)
-                return result
-            
-            # Split the CSV into lines, accounting for newlines in quotes
-            def split_csv_lines(text):
-                lines = []
-                current_line = ""
-                in_quotes = False
-                
-                for char in text:
-                    if char == '"':
-                        in_quotes = not in_quotes
-                    
-                    # Only split on newlines outside of quotes
-                    if char == '\n' and not in_quotes:
-                        lines.append(current_line)
-                        current_line = ""
-                    else:
-                        current_line += char
-                
-                # Add the last line if it's not empty
-                if current_line:
-                    lines.append(current_line)
-                
-                return lines
-            
-            # Process the CSV
-            lines = split_csv_lines(csv_string)
-            if not lines:
-                return {"error": "Empty CSV file"}
-            
-            # Parse headers
-            headers = parse_csv_line(lines[0])
-            
-            # Validate required columns
-            required_columns = ['name', 'client', 'architect', 'builder', 'site']
-            for col in required_columns:
-                if col not in headers:
-                    return {"error": f"Missing required column: {col}"}
-            
-            # Create projects from CSV
-            projects_created = []
-            for line_idx in range(1, len(lines)):
-                line = lines[line_idx]
-                if not line.strip():  # Skip empty lines
-                    continue
-                
-                values = parse_csv_line(line)
-                project_data = {}
-                
-                for j, header in enumerate(headers):
-                    if j < len(values) and values[j].strip():
-                        if header in ['project_year', 'construction_year', 'public_private_project']:
-                            try:
-                                project_data[header] = int(values[j])
-                            except ValueError:
-                                # If not a valid integer, skip this field
-                                continue
-                        else:
-                            project_data[header] = values[j]
-                
-                # Ensure required fields are present
-                if all(field in project_data for field in required_columns):
-                    try:
-                        project = Project.objects.create(**project_data)
-                        projects_created.append(project.id)
-                    except Exception as e:
-                        print(f"Error creating project on line {line_idx+1}: {str(e)}")
-                        print(f"Data: {project_data}")
-                else:
-                    missing = [field for field in required_columns if field not in project_data]
-                    print(f"Skipping line {line_idx+1}, missing fields: {missing}")
-                    print(f"Available data: {project_data}")
-            
-            return {"message": f"Successfully imported {len(projects_created)} projects", "project_ids": projects_created}
-        
-        except Exception as e:
-            import traceback
-            print(traceback.format_exc())
-            return {"error": f"Error importing CSV: {str(e)}"}
-    
-    result = await import_csv_sync()
-    if "error" in result:
-        raise HTTPException(status_code=400, detail=result["error"])
+    from .csv_import import CSVImportError, import_projects
+    # Stream the spooled upload through the csv reader instead of decoding it in memory
+    try:
+        result = await run_sync(import_projects)(file.file)
+    except CSVImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result["message"] = f"Successfully imported {len(result['project_ids'])} projects"
     return result
 
 @app.get("/projects/export-csv/")
-async def export_projects_csv(user: User = Depends(get_current_user)):
-    @sync_to_async
-    def export_csv_sync():
-        import csv
-        from io import StringIO
-        
-        projects = Project.objects.all()
-        
-        # Create CSV using csv module
-        output = StringIO()
-        writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
-        
-        headers = ['id', 'name', 'description', 'client', 'project_year', 'construction_year', 
-                'architect', 'builder', 'site', 'public_private_project', 'other']
-        
-        writer.writerow(headers)
-        
-        for project in projects:
-            row = [
-                str(project.id),
-                project.name,
-                project.description or '',
-                project.client,
-                str(project.project_year) if project.project_year else '',
-                str(project.construction_year) if project.construction_year else '',
-                project.architect,
-                project.builder,
-                project.site,
-                str(project.public_private_project),
-                project.other or ''
-            ]
-            writer.writerow(row)
-        
-        return output.getvalue()
+async def export_projects_csv(
+    format: str = "csv",
+    accept_encoding: Optional[str] = Header(None),
+    user: User = Depends(get_current_user)
+):
+    """
+    Stream every project as CSV (default) or NDJSON (?format=ndjson). The response is
+    gzip-encoded when the client accepts it.
+    """
+    from .exports import FORMATS as EXPORT_FORMATS, accepts_gzip, stream_projects
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
     
-    csv_content = await export_csv_sync()
+    media_type, filename = EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f"attachment; filename={filename}", "Vary": "Accept-Encoding"}
+    compress = accepts_gzip(accept_encoding)
+    if compress:
+        headers["Content-Encoding"] = "gzip"
     
-    from fastapi.responses import Response
-    return Response(
-        content=csv_content,
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=projects.csv"}
-    ) 
\ No newline at end of file
+    from fastapi.responses import StreamingResponse
+    return StreamingResponse(
+        stream_projects(format, compress=compress),
+        media_type=media_type,
+        headers=headers
+    )
+
+@app.get("/metrics/")
+async def metrics(user: User = Depends(get_current_user)):
+    """Request metrics of this process in the Prometheus text format (METRICS_ENABLED)"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    from fastapi.responses import PlainTextResponse
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ProjectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'project'
+
+    def ready(self):
+        # Register the token cache and page cache invalidation signal handlers,
+        # the request metrics' query timer and the search index updates
+        from . import auth, cache, metrics, search  # noqa: F401
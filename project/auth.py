@@ -0,0 +1,93 @@
+"""
+Token authentication for the FastAPI endpoints.
+
+Resolved tokens are kept in a small in-process TTL/LRU cache so repeated API
+calls skip the database and the threadpool hop. Entries are dropped when a
+Token is deleted or rotated, or its user changes, in this process; changes
+made by another process are picked up once the entry expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [k for k, (user, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    maxsize=getattr(settings, 'API_TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'API_TOKEN_CACHE_TTL', 300),
+)
+
+
+def get_user_from_token(token_value):
+    """Synchronous function to get a user from token, caching hits"""
+    user = token_cache.get(token_value)
+    if user is not None:
+        return user
+    try:
+        user = Token.objects.select_related('user').get(key=token_value).user
+    except Token.DoesNotExist:
+        return None
+    token_cache.set(token_value, user)
+    return user
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.pk)
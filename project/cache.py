@@ -0,0 +1,115 @@
+"""
+Caching for the public pages.
+
+Rendered pages are cached under a content version that is bumped whenever a
+Project or Photo is saved or deleted and after every FastAPI write. The same
+version is used as the pages' ETag and Last-Modified, so repeat visitors get
+304 responses. Each project also has its own version, which keys its card
+fragment on the home page so only changed cards are re-rendered.
+
+The version lives in the default cache, so processes only see each other's
+bumps when they share a cache backend (CACHE_BACKEND=file).
+"""
+import datetime
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Photo, Project
+
+CONTENT_VERSION_KEY = 'project:content-version'
+PROJECT_VERSION_KEY = 'project:content-version:{}'
+
+
+def get_content_version():
+    """Nanosecond timestamp of the last content change"""
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(CONTENT_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def bump_content_version(project_id=None):
+    version = time.time_ns()
+    if project_id is None:
+        cache.set(CONTENT_VERSION_KEY, version, timeout=None)
+    else:
+        cache.set_many({CONTENT_VERSION_KEY: version, PROJECT_VERSION_KEY.format(project_id): version},
+                       timeout=None)
+
+
+def annotate_project_versions(projects, default):
+    """
+    Set ``content_version`` on each project from the cache in one lookup. Projects
+    without a recorded version get ``default`` (the global version), which is never
+    older than their last change.
+    """
+    keys = {project.id: PROJECT_VERSION_KEY.format(project.id) for project in projects}
+    versions = cache.get_many(keys.values())
+    for project in projects:
+        project.content_version = versions.get(keys[project.id], default)
+    return projects
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    bump_content_version(instance.pk)
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def photo_changed(sender, instance, **kwargs):
+    bump_content_version(instance.project_id)
+
+
+def request_content_version(request):
+    # Read the version once per request; the ETag, Last-Modified and cache keys all use it
+    if not hasattr(request, '_content_version'):
+        request._content_version = get_content_version()
+    return request._content_version
+
+
+def _etag(request, *args, **kwargs):
+    # The footer shows the current year, so a new year is a new representation
+    return f"{request_content_version(request)}-{timezone.now().year}"
+
+
+def _last_modified(request, *args, **kwargs):
+    return datetime.datetime.fromtimestamp(request_content_version(request) / 1e9, tz=datetime.timezone.utc)
+
+
+def cached_page(view):
+    """
+    Serve GET/HEAD responses of ``view`` from the cache for the current content
+    version, answering conditional requests with 304 Not Modified.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = f"page:{_etag(request)}:{path}"
+
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, response, getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24))
+
+        # Browsers must revalidate, which is cheap thanks to the ETag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    return condition(etag_func=_etag, last_modified_func=_last_modified)(wrapper)
+
@@ -0,0 +1,151 @@
+"""
+Streaming CSV import for projects.
+
+Rows are read incrementally with the stdlib csv reader, validated a chunk at a
+time and written with bulk_create, all inside one transaction. Rows that can't
+be imported are reported back instead of aborting the import; if the database
+rejects a chunk, its rows are inserted one at a time to find the culprits.
+"""
+import csv
+import io
+
+from django.db import DatabaseError, transaction
+
+from .models import Project
+from .search import index_projects
+
+REQUIRED_COLUMNS = ['name', 'client', 'architect', 'builder', 'site']
+INTEGER_COLUMNS = ['id', 'project_year', 'construction_year', 'public_private_project']
+# SQLite stores integers in 64 bits; larger values make the insert fail
+INTEGER_RANGE = (-2 ** 63, 2 ** 63 - 1)
+IMPORT_COLUMNS = INTEGER_COLUMNS + ['name', 'description', 'client', 'architect', 'builder', 'site', 'other']
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class CSVImportError(Exception):
+    """The file as a whole can't be imported (empty, missing columns...)"""
+
+
+def parse_row(headers, values):
+    """Map one CSV record to Project field values, skipping blanks and invalid integers"""
+    data = {}
+    for header, value in zip(headers, values):
+        if header is None or not value.strip():
+            continue
+        if header in INTEGER_COLUMNS:
+            try:
+                data[header] = int(value)
+            except ValueError:
+                # If not a valid integer, skip this field
+                continue
+        else:
+            data[header] = value
+    return data
+
+
+def build_chunk(rows, errors):
+    """Turn parsed (line, data) rows into (line, unsaved Project) pairs, recording rows that fail validation"""
+    ids = [data['id'] for _, data in rows if 'id' in data]
+    existing_ids = set(Project.objects.filter(id__in=ids).values_list('id', flat=True)) if ids else set()
+
+    projects = []
+    for line, data in rows:
+        missing = [field for field in REQUIRED_COLUMNS if field not in data]
+        if missing:
+            errors.append({"line": line, "error": f"Missing required fields: {', '.join(missing)}"})
+            continue
+        out_of_range = [field for field in INTEGER_COLUMNS
+                        if field in data and not INTEGER_RANGE[0] <= data[field] <= INTEGER_RANGE[1]]
+        if out_of_range:
+            errors.append({"line": line, "error": f"Value out of range: {', '.join(out_of_range)}"})
+            continue
+        if 'id' in data:
+            if data['id'] in existing_ids:
+                errors.append({"line": line, "error": f"Project with id {data['id']} already exists"})
+                continue
+            existing_ids.add(data['id'])
+
+        # bulk_create bypasses Project.save, so do here what it would
+        data['description_html'] = Project.render_description(data.get('description'))
+        data['sort_year'] = Project.compute_sort_year(data.get('construction_year'), data.get('project_year'))
+        projects.append((line, Project(**data)))
+    return projects
+
+
+def insert_one_by_one(chunk, errors):
+    """Insert (line, Project) pairs each under its own savepoint, recording the rows that fail"""
+    projects = []
+    for line, project in chunk:
+        try:
+            with transaction.atomic():
+                Project.objects.bulk_create([project])
+        except (DatabaseError, OverflowError) as e:
+            project.pk = None
+            errors.append({"line": line, "error": str(e)})
+        else:
+            projects.append(project)
+    return projects
+
+
+def import_projects(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import projects from a binary file-like object containing UTF-8 CSV.
+
+    Returns a dict with the created project ids, per-line errors and any ignored
+    columns. Raises CSVImportError if the file can't be imported at all.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        return _import_rows(csv.reader(text), chunk_size)
+    finally:
+        # Don't let the wrapper close the caller's file
+        text.detach()
+
+
+def _import_rows(reader, chunk_size):
+    try:
+        headers = next(reader)
+    except StopIteration:
+        raise CSVImportError("Empty CSV file")
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise CSVImportError(f"Error importing CSV: {str(e)}")
+
+    for col in REQUIRED_COLUMNS:
+        if col not in headers:
+            raise CSVImportError(f"Missing required column: {col}")
+
+    ignored_columns = [header for header in headers if header not in IMPORT_COLUMNS]
+    # Only keep known columns; None entries are skipped by parse_row
+    headers = [header if header in IMPORT_COLUMNS else None for header in headers]
+
+    created_ids = []
+    errors = []
+
+    def flush(rows):
+        chunk = build_chunk(rows, errors)
+        try:
+            with transaction.atomic():
+                projects = Project.objects.bulk_create([project for _, project in chunk])
+        except (DatabaseError, OverflowError):
+            projects = insert_one_by_one(chunk, errors)
+        # bulk_create doesn't send post_save, so index the chunk here
+        index_projects(projects)
+        created_ids.extend(project.id for project in projects)
+
+    try:
+        with transaction.atomic():
+            rows = []
+            for values in reader:
+                if not any(value.strip() for value in values):  # Skip empty lines
+                    continue
+                rows.append((reader.line_num, parse_row(headers, values)))
+                if len(rows) >= chunk_size:
+                    flush(rows)
+                    rows = []
+            if rows:
+                flush(rows)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise CSVImportError(f"Error importing CSV on line {reader.line_num}: {str(e)}")
+
+    return {"project_ids": created_ids, "errors": errors, "ignored_columns": ignored_columns}
@@ -0,0 +1,47 @@
+"""
+Executor for the synchronous work (ORM queries, file I/O, Pillow) done by the API.
+
+asgiref's default thread-sensitive mode runs all of it on one thread for the
+whole process, so concurrent requests queue behind each other. When
+API_SYNC_THREADS is set, sync work runs on a dedicated pool of that many
+threads instead; each thread opens its own database connection, closed after
+every call following CONN_MAX_AGE as for Django requests.
+"""
+import threading
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    threads = getattr(settings, 'API_SYNC_THREADS', None)
+    if not threads:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='re-arqui-api')
+        return _executor
+
+
+def run_sync(func):
+    """Like sync_to_async(func), but on the API executor when one is configured"""
+    executor = get_executor()
+    if executor is None:
+        return sync_to_async(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(wrapper, thread_sensitive=False, executor=executor)
@@ -0,0 +1,110 @@
+"""
+Streaming project exports.
+
+Projects are read in keyset-paginated chunks of plain value tuples (no model
+instances) and encoded chunk by chunk, so memory use stays constant and the
+first bytes go out before the last rows are read.
+"""
+import csv
+import io
+import json
+import zlib
+
+from .executor import run_sync
+from .models import Project
+
+EXPORT_FIELDS = ['id', 'name', 'description', 'client', 'project_year', 'construction_year',
+                 'architect', 'builder', 'site', 'public_private_project', 'other']
+
+FORMATS = {
+    'csv': ('text/csv', 'projects.csv'),
+    'ndjson': ('application/x-ndjson', 'projects.ndjson'),
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def fetch_chunk(after_id, chunk_size):
+    return list(
+        Project.objects.filter(id__gt=after_id).order_by('id').values_list(*EXPORT_FIELDS)[:chunk_size]
+    )
+
+
+def encode_csv(rows, header=False):
+    output = io.StringIO()
+    writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    for (id, name, description, client, project_year, construction_year,
+         architect, builder, site, public_private_project, other) in rows:
+        writer.writerow([
+            str(id),
+            name,
+            description or '',
+            client,
+            str(project_year) if project_year else '',
+            str(construction_year) if construction_year else '',
+            architect,
+            builder,
+            site,
+            str(public_private_project),
+            other or ''
+        ])
+    return output.getvalue()
+
+
+def encode_ndjson(rows, header=False):
+    return ''.join(
+        json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n' for row in rows
+    )
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip: its q-value, or that of ``*``, is above 0"""
+    qualities = {}
+    for element in (accept_encoding or '').split(','):
+        coding, *params = [part.strip() for part in element.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+async def stream_projects(fmt='csv', compress=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the encoded export as bytes, gzip-compressed when ``compress`` is set"""
+    encode = ENCODERS[fmt]
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def output(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    yield output(encode([], header=True))
+
+    after_id = 0
+    while True:
+        rows = await run_sync(fetch_chunk)(after_id, chunk_size)
+        if not rows:
+            break
+        after_id = rows[-1][0]
+        yield output(encode(rows))
+
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,129 @@
+"""
+Static and media file serving.
+
+collectstatic writes content-hashed copies of the static files plus gzip and
+brotli variants (WhiteNoise's CompressedManifestStaticFilesStorage), and photos
+are stored under content hashes (see project/storage.py), so both can be
+cached by browsers for good. FilesMiddleware serves them with WhiteNoise:
+far-future Cache-Control for hashed names, ETag/Last-Modified, Range requests
+and the precompressed variants. Under WSGI the open file is handed to the
+server's ``wsgi.file_wrapper`` (sendfile in gunicorn).
+
+Django's ASGI handler reads synchronous file responses into memory before
+sending them, so ASGIFiles serves the same files in front of it, using the
+ASGI zero-copy extension when the server offers it.
+"""
+import os
+import re
+from urllib.parse import urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import IsDirectoryError, MissingFileError, SlicedFile
+from whitenoise.string_utils import ensure_leading_trailing_slash
+
+# Names written by ContentAddressedStorage: <dir>/ab/<62 hex digits>.<ext>
+CONTENT_ADDRESSED_NAME = re.compile(r'/[0-9a-f]{2}/[0-9a-f]{62}\.\w+$')
+
+
+class FilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise for STATIC_ROOT, plus MEDIA_ROOT. Uploads appear while the server
+    runs, so media files are looked up on each request instead of being listed
+    at startup.
+    """
+    def __init__(self, get_response=None, settings=settings):
+        self.media_prefix = ensure_leading_trailing_slash(urlparse(settings.MEDIA_URL).path)
+        super().__init__(get_response, settings)
+
+    @property
+    def media_root(self):
+        return os.path.abspath(settings.MEDIA_ROOT).rstrip(os.sep) + os.sep
+
+    def __call__(self, request):
+        static_file = self.find(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return self.get_response(request)
+
+    def find(self, url):
+        if url.startswith(self.media_prefix):
+            return self.find_media(url)
+        if self.autorefresh:
+            return self.find_file(url)
+        return self.files.get(url)
+
+    def find_media(self, url):
+        if not self.url_is_canonical(url):
+            return None
+        path = os.path.join(self.media_root, url[len(self.media_prefix):])
+        if not path.startswith(self.media_root):
+            return None
+        try:
+            return self.get_static_file(path, url)
+        except (IsDirectoryError, MissingFileError):
+            return None
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.media_prefix):
+            return bool(CONTENT_ADDRESSED_NAME.search(url))
+        return super().immutable_file_test(path, url)
+
+
+class ASGIFiles:
+    """ASGI application serving FilesMiddleware's files and passing other requests to ``app``"""
+    chunk_size = 64 * 1024
+
+    def __init__(self, app):
+        self.app = app
+        self.files = FilesMiddleware()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            path = scope['path']
+            root_path = scope.get('root_path', '')
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            static_file = self.files.find(path)
+            if static_file is not None:
+                return await self.serve(static_file, scope, send)
+        await self.app(scope, receive, send)
+
+    async def serve(self, static_file, scope, send):
+        # WhiteNoise reads the request headers WSGI-style
+        request_headers = {
+            'HTTP_' + name.decode('latin-1').upper().replace('-', '_'): value.decode('latin-1')
+            for name, value in scope['headers']
+        }
+        response = static_file.get_response(scope['method'], request_headers)
+        await send({
+            'type': 'http.response.start',
+            'status': int(response.status),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response.headers],
+        })
+
+        file = response.file
+        if file is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        try:
+            if 'http.response.zerocopy' in scope.get('extensions', {}):
+                message = {'type': 'http.response.zerocopy'}
+                if isinstance(file, SlicedFile):
+                    message.update(file=file.fileobj, offset=file.fileobj.tell(), count=file.remaining)
+                else:
+                    message.update(file=file)
+                await send(message)
+                return
+
+            read = sync_to_async(file.read, thread_sensitive=False)
+            while True:
+                chunk = await read(self.chunk_size)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': bool(chunk)})
+                if not chunk:
+                    break
+        finally:
+            file.close()
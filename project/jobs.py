@@ -0,0 +1,214 @@
+"""
+In-process background jobs for long running API requests.
+
+Work items are spread over a bounded, shared thread pool (Pillow and file I/O
+release the GIL, so decoding, copying and rendition work run in parallel) and
+progress is tracked per item so clients can poll a job while it runs. Jobs
+run in the process that started them; snapshots of their status are also
+published to the default cache, so with several workers sharing it (see
+run_prod.py) any of them can answer a poll.
+
+A job only lives as long as its process: run_prod.py's workers wait for theirs
+(wait_for_jobs) before exiting, but a process killed meanwhile loses the items
+still running, whose files may be stored without their Photo rows.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger('django')
+
+# Finished jobs kept around for status polling before the oldest are dropped
+MAX_FINISHED_JOBS = 100
+
+STATUS_KEY = 'project:job:{}'
+STATUS_TIMEOUT = 60 * 60 * 24
+# Seconds between the status snapshots of a running job
+STATUS_INTERVAL = 1.0
+
+_executor = None
+_executor_lock = threading.Lock()
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def worker_count():
+    return getattr(settings, 'BACKGROUND_WORKERS', None) or min(8, os.cpu_count() or 1)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=worker_count(), thread_name_prefix='re-arqui-job')
+        return _executor
+
+
+class Job:
+    def __init__(self, total, finish=None):
+        self.id = uuid.uuid4().hex
+        self.status = 'pending' if total else 'completed'
+        self.items = [{'index': i, 'status': 'pending'} for i in range(total)]
+        self.created_at = timezone.now()
+        self.finished_at = None if total else self.created_at
+        self._remaining = total
+        self._finish = finish
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if not total:
+            self._done.set()
+        self._publish_lock = threading.Lock()
+        self._published_at = 0.0
+        self._published_final = False
+
+    def _item_started(self, index):
+        with self._lock:
+            self.status = 'running'
+            self.items[index]['status'] = 'running'
+
+    def _item_finished(self, index, **data):
+        with self._lock:
+            self.items[index].update(data)
+            self._remaining -= 1
+            remaining = self._remaining
+        if remaining:
+            self.publish()
+        else:
+            self._complete()
+
+    def _complete(self):
+        updates = {}
+        if self._finish is not None:
+            with self._lock:
+                results = {item['index']: item['result'] for item in self.items if item['status'] == 'done'}
+            try:
+                updates = {index: {'result': result} for index, result in self._finish(results).items()}
+            except Exception as e:
+                updates = {index: {'status': 'failed', 'error': str(e)} for index in results}
+
+        with self._lock:
+            for index, data in updates.items():
+                if data.get('status') == 'failed':
+                    self.items[index].pop('result', None)
+                self.items[index].update(data)
+            self.status = 'completed'
+            self.finished_at = timezone.now()
+        self.publish(force=True)
+        self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def results(self):
+        """Results and errors in the shape returned by the synchronous endpoints"""
+        with self._lock:
+            return {
+                "results": [item['result'] for item in self.items if item['status'] == 'done'],
+                "errors": [{"index": item['index'], "error": item['error']}
+                           for item in self.items if item['status'] == 'failed'],
+            }
+
+    def as_dict(self):
+        with self._lock:
+            counts = {}
+            for item in self.items:
+                counts[item['status']] = counts.get(item['status'], 0) + 1
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "total": len(self.items),
+                "done": counts.get('done', 0),
+                "failed": counts.get('failed', 0),
+                "pending": counts.get('pending', 0) + counts.get('running', 0),
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                "items": [dict(item) for item in self.items],
+            }
+
+    def publish(self, force=False):
+        """Store a status snapshot in the cache, at most every STATUS_INTERVAL unless ``force``"""
+        with self._publish_lock:
+            # Snapshot and store under the lock, so an older snapshot never replaces the final one
+            if self._published_final or (not force and time.monotonic() - self._published_at < STATUS_INTERVAL):
+                return
+            status = self.as_dict()
+            cache.set(STATUS_KEY.format(self.id), status, STATUS_TIMEOUT)
+            self._published_at = time.monotonic()
+            self._published_final = status['status'] == 'completed'
+
+
+def _run_item(job, index, func, item):
+    job._item_started(index)
+    try:
+        result = func(item)
+    except Exception as e:
+        job._item_finished(index, status='failed', error=str(e))
+    else:
+        job._item_finished(index, status='done', result=result)
+    finally:
+        # Worker threads are reused; don't keep their DB connections open between items
+        connections.close_all()
+
+
+def start_job(func, items, finish=None):
+    """
+    Run ``func(item)`` for every item on the worker pool and return the tracking Job.
+
+    If given, ``finish`` is called once after the last item, with a dict of the
+    successful items' results by index, and returns their final results. The job
+    only completes after it; if it raises, those items are marked failed.
+    """
+    job = Job(len(items), finish)
+
+    with _jobs_lock:
+        finished = [j for j in _jobs.values() if j.status == 'completed']
+        for old in sorted(finished, key=lambda j: j.created_at)[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _jobs[old.id]
+        _jobs[job.id] = job
+    job.publish(force=True)
+
+    executor = get_executor()
+    for index, item in enumerate(items):
+        executor.submit(_run_item, job, index, func, item)
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def job_status(job_id):
+    """Status of a job started by this process or, through the cache, by another one"""
+    job = get_job(job_id)
+    if job is not None:
+        return job.as_dict()
+    return cache.get(STATUS_KEY.format(job_id))
+
+
+def wait_for_jobs(timeout, tick=None, interval=1.0):
+    """
+    Wait up to ``timeout`` seconds for the jobs running in this process to complete,
+    calling ``tick()`` every ``interval`` seconds meanwhile. Returns whether they did.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        with _jobs_lock:
+            running = [job for job in _jobs.values() if not job.wait(0)]
+        if not running:
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning("Gave up waiting for jobs %s", ', '.join(job.id for job in running))
+            return False
+        running[0].wait(min(interval, remaining))
+        if tick is not None:
+            tick()
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from project.cache import bump_content_version
+from project.metadata import image_metadata
+from project.models import Photo
+
+METADATA_FIELDS = ['width', 'height', 'file_size', 'dominant_color', 'blurhash']
+
+
+class Command(BaseCommand):
+    help = "Read dimensions, byte size, dominant colour and BlurHash for photos stored before they were recorded"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help="Only process photos of this project id")
+        parser.add_argument('--force', action='store_true', help="Read metadata that is already recorded again")
+        parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1),
+                            help="Number of files read in parallel")
+        parser.add_argument('--batch-size', type=int, default=200, help="Photos written per UPDATE batch")
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.exclude(image='').only('id', 'project_id', 'image').order_by('id')
+        if options['project']:
+            photos = photos.filter(project_id=options['project'])
+        if not options['force']:
+            photos = photos.filter(blurhash='')
+
+        updated = failed = 0
+        # Workers only read files; the main thread does every query
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            batch = []
+            for photo in photos.iterator(chunk_size=options['batch_size']):
+                batch.append(photo)
+                if len(batch) >= options['batch_size']:
+                    done, errors = self.process(executor, batch)
+                    updated, failed, batch = updated + done, failed + errors, []
+            if batch:
+                done, errors = self.process(executor, batch)
+                updated, failed = updated + done, failed + errors
+
+        self.stdout.write(self.style.SUCCESS(f"Recorded metadata for {updated} photos ({failed} failed)"))
+
+    def process(self, executor, photos):
+        """Read the metadata of ``photos`` in parallel and save it with one bulk_update"""
+        read = []
+        failed = 0
+        # Files shared by several photos are only read once
+        by_name = {}
+        for photo in photos:
+            by_name.setdefault(photo.image.name, photo.image)
+        metadata = dict(zip(by_name, executor.map(image_metadata, by_name.values())))
+
+        for photo in photos:
+            values = metadata[photo.image.name]
+            if not values['blurhash']:
+                failed += 1
+                self.stderr.write(f"{photo.image.name}: could not be read")
+                continue
+            for field, value in values.items():
+                setattr(photo, field, value)
+            read.append(photo)
+
+        Photo.objects.bulk_update(read, METADATA_FIELDS)
+        # bulk_update sends no post_save; refresh the cached pages showing these photos
+        for project_id in {photo.project_id for photo in read}:
+            bump_content_version(project_id)
+        return len(read), failed
@@ -0,0 +1,47 @@
+import csv
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from project.csv_import import import_projects
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time the CSV importer on a synthetic file; the imported rows are rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(['name', 'description', 'client', 'project_year', 'construction_year',
+                         'architect', 'builder', 'site', 'public_private_project', 'other'])
+        for i in range(options['rows']):
+            writer.writerow([f'Projeto {i}', f'Descrição do projeto {i}\nSegunda linha, com "aspas"',
+                             f'Cliente {i}', 1987 + i % 38, '' if i % 3 else 2000 + i % 25,
+                             'Rita Dias, Nuno Félix', f'Construtor {i % 50}', 'Lisboa', i % 2, ''])
+        stream = io.BytesIO(text.getvalue().encode('utf-8'))
+
+        kwargs = {'chunk_size': options['chunk_size']} if options['chunk_size'] else {}
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                result = import_projects(stream, **kwargs)
+                elapsed = time.perf_counter() - start
+                raise Rollback
+        except Rollback:
+            pass
+
+        rows = len(result['project_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s, "
+            f"{len(result['errors'])} errors); changes rolled back"
+        ))
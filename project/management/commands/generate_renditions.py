@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from project.models import Photo
+
+
+class Command(BaseCommand):
+    help = "Generate responsive renditions for photos uploaded before they existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help="Only process photos of this project id")
+        parser.add_argument('--force', action='store_true', help="Regenerate renditions that already exist")
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.exclude(image='').order_by('id')
+        if options['project']:
+            photos = photos.filter(project_id=options['project'])
+
+        generated = skipped = failed = 0
+        for photo in photos.iterator():
+            if not options['force'] and photo.renditions.get('source') == photo.image.name:
+                skipped += 1
+                continue
+
+            photo.update_image_details(reuse=not options['force'])
+            if photo.renditions:
+                generated += 1
+                self.stdout.write(f"{photo.image.name}: {len(photo.renditions['files'])} renditions")
+            else:
+                failed += 1
+                self.stderr.write(f"{photo.image.name}: could not be read")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated renditions for {generated} photos ({skipped} up to date, {failed} failed)"
+        ))
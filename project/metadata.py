@@ -0,0 +1,122 @@
+"""
+Metadata read from photo files when they are stored.
+
+Display size, byte size, a dominant colour and a BlurHash
+(https://blurha.sh) are kept on Photo, so pages and API clients can lay out
+and paint placeholders without the server opening the file again. The
+placeholder values come from a tiny thumbnail; for JPEGs Pillow decodes it
+straight from a reduced-scale DCT, so the full image is never decoded.
+"""
+import logging
+import math
+
+from .renditions import display_size
+
+logger = logging.getLogger('django')
+
+# Longest side of the thumbnail the colour and BlurHash are computed from
+PLACEHOLDER_SIZE = 32
+# BlurHash components across and down; 4x3 gives a 28 character hash
+BLURHASH_COMPONENTS = (4, 3)
+
+BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+EMPTY_METADATA = {'width': None, 'height': None, 'file_size': None, 'dominant_color': '', 'blurhash': ''}
+
+
+def _base83(value, length):
+    return ''.join(BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(value):
+    value /= 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def blurhash(image, components=BLURHASH_COMPONENTS):
+    """BlurHash of a small RGB PIL image"""
+    x_components, y_components = components
+    width, height = image.size
+    pixels = [tuple(_srgb_to_linear(channel) for channel in pixel) for pixel in image.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            normalisation = 1 if i == j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pixel = pixels[row + x]
+                    r += basis * pixel[0]
+                    g += basis * pixel[1]
+                    b += basis * pixel[2]
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83(x_components - 1 + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(max(abs(v) for factor in ac for v in factor) * 166 - 0.5)))
+        maximum = (quantised_max + 1) / 166
+    else:
+        quantised_max, maximum = 0, 1
+    result += _base83(quantised_max, 1)
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (max(0, min(18, int(_sign_pow(v / maximum, 0.5) * 9 + 9.5))) for v in factor)
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def dominant_color(image):
+    """Most common colour of a small RGB PIL image as #rrggbb"""
+    quantized = image.quantize(colors=5)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def read_metadata(file):
+    """Display size, dominant colour and BlurHash of an open image file"""
+    from PIL import Image, ImageOps
+
+    with Image.open(file) as image:
+        width, height = display_size(image)
+        # Lets the JPEG decoder scale down by up to 8x while decoding
+        image.draft('RGB', (PLACEHOLDER_SIZE * 2, PLACEHOLDER_SIZE * 2))
+        thumbnail = ImageOps.exif_transpose(image).convert('RGB')
+    thumbnail.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+
+    return {
+        'width': width,
+        'height': height,
+        'dominant_color': dominant_color(thumbnail),
+        'blurhash': blurhash(thumbnail),
+    }
+
+
+def image_metadata(image_field):
+    """Metadata for the Photo fields of a stored image; empty values if it can't be read"""
+    try:
+        with image_field.open('rb') as f:
+            metadata = read_metadata(f)
+        metadata['file_size'] = image_field.size
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read metadata of {image_field.name}: {str(e)}")
+        return dict(EMPTY_METADATA)
+    return metadata
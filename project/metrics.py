@@ -0,0 +1,242 @@
+"""
+Request instrumentation for the Django site and the FastAPI app.
+
+With METRICS_ENABLED, each request records its wall time, database queries
+(count and time), template rendering time and response size. They are sent
+back in a ``Server-Timing`` header, so they show up in the browser's network
+panel, and aggregated into per-route histograms served in the Prometheus text
+format at /metrics/ (Django) and /api/metrics/ (FastAPI) to staff users and
+API tokens.
+
+Metrics are kept in process memory: each worker process reports its own and
+Prometheus adds them up across targets. When disabled, MetricsMiddleware
+removes itself from the stack and the FastAPI middleware passes requests
+straight through; the query and template timers are still installed but only
+do a context variable lookup.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Metrics of the request being handled; copied into the threads running its sync work
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('start', 'queries', 'db_time', 'template_time', 'rendering')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def server_timing(self):
+        total = (time.perf_counter() - self.start) * 1000
+        timing = f'app;dur={total:.1f}, db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"'
+        if self.template_time:
+            timing += f', tpl;dur={self.template_time * 1000:.1f}'
+        return timing
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * (len(self.buckets) + 1), 0))
+            counts[index] += 1
+            self._series[labels] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, (counts, total) in series:
+            label_text = _labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f'{self.name}{{{_labels(labels)}}} {value}' for labels, value in values)
+        return lines
+
+
+def _labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+requests_total = Counter('http_requests_total', 'Requests handled, by response status')
+request_duration = Histogram('http_request_duration_seconds', 'Request wall time', DURATION_BUCKETS)
+db_queries = Histogram('http_request_db_queries', 'Database queries per request', QUERY_BUCKETS)
+db_duration = Histogram('http_request_db_duration_seconds', 'Time spent in database queries', DURATION_BUCKETS)
+template_duration = Histogram('http_request_template_duration_seconds', 'Time spent rendering templates',
+                              DURATION_BUCKETS)
+response_size = Histogram('http_response_size_bytes', 'Response body size', SIZE_BUCKETS)
+
+METRICS = [requests_total, request_duration, db_queries, db_duration, template_duration, response_size]
+
+
+def render_metrics():
+    """All metrics of this process in the Prometheus text format"""
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+
+def record(app, method, route, status, metrics, size):
+    labels = (('app', app), ('method', method), ('route', route))
+    requests_total.inc(labels + (('status', str(status)),))
+    request_duration.observe(labels, time.perf_counter() - metrics.start)
+    db_queries.observe(labels, metrics.queries)
+    db_duration.observe(labels, metrics.db_time)
+    if app == 'django':
+        template_duration.observe(labels, metrics.template_time)
+    if size is not None:
+        response_size.observe(labels, size)
+
+
+def time_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+@receiver(connection_created)
+def install_query_timer(connection, **kwargs):
+    # Connected when the app is ready, before any connection is opened
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class MetricsMiddleware:
+    """Django middleware recording the metrics of each request and adding Server-Timing"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        match = request.resolver_match
+        route = match.route if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = metrics.server_timing()
+        record('django', request.method, route, response.status_code, metrics, size)
+        return response
+
+
+class ASGIMetricsMiddleware:
+    """The same for the FastAPI app, as ASGI middleware so streamed bodies are counted"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not getattr(settings, 'METRICS_ENABLED', False):
+            return await self.app(scope, receive, send)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status, size = 500, 0
+
+        async def send_with_timing(message):
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', metrics.server_timing().encode('latin-1')))
+                message = {**message, 'headers': headers}
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # The router stores the matched route in the scope
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            record('fastapi', scope['method'], route, status, metrics, size)
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        # Templates rendered from inside another template are part of its time
+        if metrics is None or metrics.rendering:
+            return self.template.render(context, request)
+        metrics.rendering = True
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+            metrics.rendering = False
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """Django's template backend, timing renders for the request metrics"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -1,56 +1,35 @@
-import os
-import django
 from django.conf import settings
-from django.core.handlers.wsgi import WSGIHandler
 from django.http import HttpResponse
 import logging
 import socket
 import errno
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "re_arqui.settings")
-django.setup()
-
-# Import the FastAPI app
-from project.api import app as fastapi_app
-
-from asgiref.sync import sync_to_async
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-
 logger = logging.getLogger('django')
 
-class DjangoMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.django_app = WSGIHandler()
-        self.mount_path = getattr(settings, "FASTAPI_MOUNT_PATH", "/api")
-
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        
-        # If the path starts with the mount path, use FastAPI
-        if path.startswith(self.mount_path):
-            response = await call_next(request)
-            return response
-        
-        # Otherwise, use Django
-        return await self.handle_django(request)
-    
-    @sync_to_async
-    def handle_django(self, request: Request):
-        # Convert FastAPI request to Django request
-        scope = request.scope
-        
-        # Handle Django request
-        django_response = HttpResponse("Django Response", content_type="text/plain")
+class DjangoMiddleware:
+    """
+    ASGI application that serves the FastAPI app under FASTAPI_MOUNT_PATH and hands
+    every other request to Django's ASGI handler, so one process serves both.
+    The FastAPI app sees the mount path as its root_path, like a Starlette Mount.
+    """
+    def __init__(self, app, django_app, mount_path=None):
+        self.app = app
+        self.django_app = django_app
+        self.mount_path = (mount_path or getattr(settings, "FASTAPI_MOUNT_PATH", "/api")).rstrip("/")
+
+    async def __call__(self, scope, receive, send):
+        # Django's ASGI handler doesn't implement the lifespan protocol
+        if scope["type"] == "lifespan":
+            return await self.app(scope, receive, send)
         
-        # This is a simplified example - in a real implementation, you would
-        # need to properly convert the request and get a real Django response
+        path = scope["path"]
+        if path == self.mount_path or path.startswith(self.mount_path + "/"):
+            scope = dict(scope)
+            scope["root_path"] = scope.get("root_path", "") + self.mount_path
+            scope["path"] = path[len(self.mount_path):] or "/"
+            return await self.app(scope, receive, send)
         
-        return django_response
-
-# Add middleware to FastAPI
-fastapi_app.add_middleware(DjangoMiddleware)
+        return await self.django_app(scope, receive, send)
 
 class BrokenPipeErrorMiddleware:
     """
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0003_alter_project_architect_alter_project_builder_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
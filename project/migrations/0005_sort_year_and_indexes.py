@@ -0,0 +1,38 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:28
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+
+def populate_sort_year(apps, schema_editor):
+    Project = apps.get_model('project', 'Project')
+    Project.objects.update(sort_year=Coalesce('construction_year', 'project_year', Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0004_photo_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='sort_year',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_sort_year, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_cover_image', True)), fields=['project'], name='photo_project_cover_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['project', 'index'], name='photo_project_index_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['public_private_project', 'sort_year'], name='project_home_order_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:34
+
+from django.db import migrations, models
+import project.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0005_sort_year_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='photo',
+            name='image',
+            field=models.ImageField(db_index=True, storage=project.storage.get_photo_storage, upload_to='project/photos/'),
+        ),
+    ]
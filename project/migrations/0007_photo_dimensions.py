@@ -0,0 +1,25 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+# Existing photos are given their dimensions by `manage.py backfill_photo_metadata`,
+# rather than by opening every media file during migrate
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0006_photo_content_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0007_photo_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='blurhash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='dominant_color',
+            field=models.CharField(blank=True, editable=False, max_length=7),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
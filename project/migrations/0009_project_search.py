@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.utils.html import strip_tags
+
+FIELDS = ['name', 'description', 'client', 'architect', 'builder', 'site']
+
+
+def populate_search_index(apps, schema_editor):
+    Project = apps.get_model('project', 'Project')
+    rows = [
+        (row[0], *[strip_tags(value or '') if field == 'description' else value or ''
+                   for field, value in zip(FIELDS, row[1:])])
+        for row in Project.objects.values_list('id', *FIELDS).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO project_search (rowid, {', '.join(FIELDS)}) VALUES ({', '.join(['%s'] * (len(FIELDS) + 1))})",
+            rows,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0008_photo_metadata'),
+    ]
+
+    operations = [
+        # FTS5 index of the projects' text, see project/search.py
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE project_search USING fts5("
+            "name, description, client, architect, builder, site, "
+            "tokenize = 'unicode61 remove_diacritics 2')",
+            "DROP TABLE project_search",
+        ),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.10 on 2026-10-18 12:03
+
+import re
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+BREAK = re.compile(r'<br\s*/?>')
+PARAGRAPH_BREAK = re.compile(r'</p>\s*<p>')
+PARAGRAPH_TAG = re.compile(r'</?p>')
+
+
+def html_to_text(html):
+    """
+    Undo linebreaks(), however many times it was applied: every save wrapped the
+    stored HTML in another layer of <p> tags.
+    """
+    text = BREAK.sub('\n', html)
+    text = PARAGRAPH_BREAK.sub('\n\n', text)
+    return PARAGRAPH_TAG.sub('', text).strip()
+
+
+def split_descriptions(apps, schema_editor):
+    Project = apps.get_model('project', 'Project')
+    projects = list(Project.objects.exclude(description=None).exclude(description='').only('id', 'description'))
+    for project in projects:
+        if project.description.startswith('<p>'):
+            project.description = html_to_text(project.description)
+        project.description_html = linebreaks(project.description)
+    Project.objects.bulk_update(projects, ['description', 'description_html'], batch_size=500)
+
+    # The search index holds the description too
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany("UPDATE project_search SET description = %s WHERE rowid = %s",
+                           [(project.description, project.id) for project in projects])
+
+
+def join_descriptions(apps, schema_editor):
+    Project = apps.get_model('project', 'Project')
+    Project.objects.exclude(description_html='').update(description=models.F('description_html'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0009_project_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='description_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(split_descriptions, join_descriptions),
+    ]
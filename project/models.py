@@ -1,10 +1,25 @@
 from django.db import models
 
+from .storage import get_photo_storage
+
 # Create your models here.
 
+class ProjectQuerySet(models.QuerySet):
+    def with_cover_image(self):
+        # Fetch every cover photo in one extra query instead of one per project
+        return self.prefetch_related(
+            models.Prefetch(
+                'photo_set',
+                queryset=Photo.objects.filter(is_cover_image=True),
+                to_attr='cover_photos',
+            )
+        )
+
 class Project(models.Model):
     name = models.CharField(max_length=255)
+    # Plain text as entered; description_html is rendered from it once per change
     description = models.TextField(null=True, blank=True)
+    description_html = models.TextField(blank=True, default='', editable=False)
     client = models.CharField(max_length=255, null=True, blank=True)
     project_year = models.IntegerField(null=True, blank=True)
     construction_year = models.IntegerField(null=True, blank=True)
@@ -13,26 +28,93 @@ class Project(models.Model):
     site = models.CharField(max_length=255, null=True, blank=True)
     public_private_project = models.IntegerField(default=0)
     other = models.TextField(null=True, blank=True)
+    # Construction year, else project year, else 0; the home page sorts on it
+    sort_year = models.IntegerField(default=0, editable=False)
+
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['public_private_project', 'sort_year'], name='project_home_order_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def compute_sort_year(construction_year, project_year):
+        if construction_year is not None:
+            return construction_year
+        if project_year is not None:
+            return project_year
+        return 0
+
+    @staticmethod
+    def render_description(description):
+        from django.utils.html import linebreaks
+        return linebreaks(description) if description else ''
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded text so saves only re-render a changed description
+        if 'description' in field_names:
+            instance._rendered_description = instance.description
+        return instance
+
     def save(self, *args, **kwargs):
-        if self.description:
-            from django.utils.html import linebreaks
-            self.description = linebreaks(self.description)
+        self.sort_year = self.compute_sort_year(self.construction_year, self.project_year)
+        extra_fields = {'sort_year'}
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+        # Only when the description itself is saved, so the two stay in step
+        if ((update_fields is None or 'description' in update_fields)
+                and 'description' not in self.get_deferred_fields()
+                and self.description != getattr(self, '_rendered_description', None)):
+            self.description_html = self.render_description(self.description)
+            self._rendered_description = self.description
+            extra_fields.add('description_html')
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields | extra_fields
         super().save(*args, **kwargs)
 
+    def cover_photo(self):
+        # Use the prefetched cover from with_cover_image() when available
+        if hasattr(self, 'cover_photos'):
+            return self.cover_photos[0] if self.cover_photos else None
+        return self.photo_set.filter(is_cover_image=True).first()
+
     def cover_image(self):
-        cover = self.photo_set.filter(is_cover_image=True).first()
+        cover = self.cover_photo()
         return cover.image.url if cover else None
 
 class Photo(models.Model):
     index = models.IntegerField(null=True, blank=True)
     title = models.CharField(max_length=100)
-    image = models.ImageField(upload_to='project/photos/')
+    image = models.ImageField(upload_to='project/photos/', storage=get_photo_storage, db_index=True)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     is_cover_image = models.BooleanField(default=False)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # Read from the file when it's stored (see project/metadata.py), so pages can lay
+    # out and paint a placeholder without opening it again
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    dominant_color = models.CharField(max_length=7, blank=True, editable=False)
+    blurhash = models.CharField(max_length=64, blank=True, editable=False)
+
+    # Fields derived from the image file, refreshed whenever it changes
+    IMAGE_DETAIL_FIELDS = ['renditions', 'width', 'height', 'file_size', 'dominant_color', 'blurhash']
+
+    class Meta:
+        indexes = [
+            # Partial index: Django filters booleans as a bare column, which only a
+            # matching WHERE clause on the index lets SQLite use
+            models.Index(fields=['project'], condition=models.Q(is_cover_image=True),
+                         name='photo_project_cover_idx'),
+            models.Index(fields=['project', 'index'], name='photo_project_index_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -41,3 +123,60 @@ class Photo(models.Model):
         if self.is_cover_image:
             Photo.objects.filter(project=self.project, is_cover_image=True).update(is_cover_image=False)
         super().save(*args, **kwargs)
+        if self.image and self.renditions.get('source') != self.image.name:
+            self.update_image_details()
+
+    def update_image_details(self, reuse=True):
+        """Generate the renditions and metadata of the image, or copy them from a photo of the same file"""
+        from .renditions import delete_renditions
+        old = self.renditions
+        details = (reuse and Photo.shared_image_details(self.image.name)) or Photo.read_image_details(self.image)
+        for field, value in details.items():
+            setattr(self, field, value)
+        Photo.objects.filter(pk=self.pk).update(**details)
+        # update() sends no post_save; the cached pages show the renditions and metadata
+        from .cache import bump_content_version
+        bump_content_version(self.project_id)
+
+        # Stored files are shared by every photo with the same content
+        if old.get('source') and not Photo.objects.filter(image=old['source']).exists():
+            kept = {rendition['name'] for rendition in self.renditions.get('files', [])}
+            delete_renditions({'files': [r for r in old.get('files', []) if r['name'] not in kept]},
+                              self.image.storage)
+
+    @staticmethod
+    def read_image_details(image):
+        """IMAGE_DETAIL_FIELDS for a stored image file"""
+        from .metadata import image_metadata
+        from .renditions import generate_renditions
+        return {'renditions': generate_renditions(image), **image_metadata(image)}
+
+    @staticmethod
+    def shared_image_details(image_name):
+        """IMAGE_DETAIL_FIELDS of another photo of the same stored file, if it has them"""
+        for details in Photo.objects.filter(image=image_name).values(*Photo.IMAGE_DETAIL_FIELDS):
+            if details['renditions'].get('source') == image_name:
+                return details
+        return None
+
+    @property
+    def srcset(self):
+        from .renditions import FALLBACK_FORMAT, build_srcset
+        return build_srcset(self.renditions, self.image.storage, FALLBACK_FORMAT)
+
+    @property
+    def thumbnail_url(self):
+        """URL of the smallest rendition, for previews; None until renditions exist"""
+        from .renditions import smallest_rendition
+        rendition = smallest_rendition(self.renditions)
+        return self.image.storage.url(rendition['name']) if rendition else None
+
+    @property
+    def sources(self):
+        """Alternative formats (WebP/AVIF) as <source> type/srcset pairs"""
+        from .renditions import FORMATS, SOURCE_FORMATS, build_srcset
+        formats = {r['format'] for r in self.renditions.get('files', [])}
+        return [
+            {'type': FORMATS[fmt][1], 'srcset': build_srcset(self.renditions, self.image.storage, fmt)}
+            for fmt in SOURCE_FORMATS if fmt in formats
+        ]
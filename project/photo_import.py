@@ -0,0 +1,189 @@
+"""
+Bulk photo import from local file paths.
+
+Every project a batch refers to is looked up up front (one query for catalog
+names, one for ids). The items are then validated and copied into media
+storage, with their renditions and metadata, on the background worker pool;
+the database is only read there to reuse the details of files already stored.
+Once all of them have run, the photos are inserted with one bulk_create and
+cover images are settled once per project.
+"""
+import logging
+import os
+
+from django.core.files import File
+from django.db import transaction
+
+from .cache import bump_content_version
+from .jobs import start_job
+from .models import Photo, Project
+from .renditions import delete_renditions
+
+logger = logging.getLogger('django')
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def resolve_projects(items):
+    """
+    Find the project of every item, by ``catalog`` (project name) first and then
+    by ``project_id``. Returns a list with a Project or a ValueError per item.
+    """
+    names = {item['catalog'] for item in items if isinstance(item.get('catalog'), str) and item['catalog']}
+    ids = {_as_id(item.get('project_id')) for item in items if item.get('project_id')} - {None}
+
+    by_name = {}
+    if names:
+        for project in Project.objects.filter(name__in=names).only('id', 'name'):
+            by_name.setdefault(project.name, []).append(project)
+    by_id = Project.objects.only('id', 'name').in_bulk(ids) if ids else {}
+
+    projects = []
+    for item in items:
+        matches = by_name.get(item.get('catalog'), []) if isinstance(item.get('catalog'), str) else []
+        if len(matches) > 1:
+            projects.append(ValueError(f"More than one project is named {item['catalog']}"))
+        elif matches:
+            projects.append(matches[0])
+        elif item.get('project_id'):
+            project = by_id.get(_as_id(item['project_id']))
+            projects.append(project or ValueError(
+                f"Project not found: {item.get('catalog', '')} or ID: {item.get('project_id', '')}"
+            ))
+        else:
+            projects.append(ValueError("No valid project specified. Provide either catalog (project name) or project_id"))
+    return projects
+
+
+class PhotoBatch:
+    def __init__(self, items):
+        self.items = items
+        self.projects = resolve_projects(items)
+        # Index -> unsaved Photo whose files are already in storage
+        self.photos = {}
+        # Files first stored by this batch, and image details by stored file name
+        self.created = set()
+        self.known_details = {}
+
+    def prepare(self, index):
+        """
+        Validate one item and copy its image (and renditions) into media storage.
+        Runs on a background worker; errors are raised and recorded against the item.
+        """
+        item = self.items[index]
+        if not all(key in item for key in ["title", "image_path"]):
+            raise ValueError("Missing required fields: title, image_path")
+
+        project = self.projects[index]
+        if isinstance(project, Exception):
+            raise project
+
+        image_path = item["image_path"]
+        if not os.path.exists(image_path):
+            raise ValueError(f"Image file not found: {image_path}")
+
+        # Reject corrupt or non-image files before storing anything
+        from PIL import Image
+        try:
+            with Image.open(image_path) as img:
+                img.verify()
+        except Exception as e:
+            raise ValueError(f"Invalid image file {image_path}: {str(e)}")
+
+        photo = Photo(
+            title=item["title"],
+            project=project,
+            is_cover_image=bool(item.get("is_cover_image", False)),
+            index=item.get("index", None)
+        )
+        # Content-addressed storage: a file that's already stored isn't copied again,
+        # and its renditions and metadata are taken from the photos that already use it
+        name = photo.image.field.generate_filename(photo, os.path.basename(image_path))
+        with open(image_path, 'rb') as src_file:
+            content = File(src_file)
+            photo.image.name, created, _ = photo.image.storage.store(name, content)
+            size = content.size
+
+        details = self.known_details.get(photo.image.name)
+        if details is None and not created:
+            details = Photo.shared_image_details(photo.image.name)
+        if not details:
+            details = Photo.read_image_details(photo.image)
+        self.known_details[photo.image.name] = details
+        for field, value in details.items():
+            setattr(photo, field, value)
+        self.photos[index] = photo
+        if created:
+            self.created.add(photo.image.name)
+
+        return {
+            "title": photo.title,
+            "project_id": project.id,
+            "project_name": project.name,
+            "image_url": photo.image.url,
+            "srcset": photo.srcset,
+            "size": size,
+            "deduplicated": not created
+        }
+
+    def save(self, results):
+        """Insert the prepared photos of the successful items and return their final results"""
+        indexes = sorted(results)
+        photos = [self.photos[index] for index in indexes]
+
+        # The last cover of each project wins, as if the photos had been saved one by one
+        covers = {photo.project_id: photo for photo in photos if photo.is_cover_image}
+        for photo in photos:
+            if photo.is_cover_image and covers[photo.project_id] is not photo:
+                photo.is_cover_image = False
+
+        try:
+            with transaction.atomic():
+                Photo.objects.bulk_create(photos)
+                if covers:
+                    Photo.objects.filter(project_id__in=covers, is_cover_image=True).exclude(
+                        id__in=[photo.id for photo in covers.values()]
+                    ).update(is_cover_image=False)
+        except Exception:
+            self.discard_stored(photos)
+            raise
+
+        # bulk_create doesn't send post_save, so bump the page cache versions here
+        for project_id in {photo.project_id for photo in photos}:
+            bump_content_version(project_id)
+
+        saved = sum(results[index]['size'] for index in indexes if results[index]['deduplicated'])
+        logger.info(f"Photo batch: saved {len(photos)} photos, {saved} bytes deduplicated")
+
+        return {index: {"id": photo.id, **results[index]} for index, photo in zip(indexes, photos)}
+
+
+    def discard_stored(self, photos):
+        """
+        Delete the files this batch stored for ``photos``, after a failed insert. Stored
+        files are shared by content, so those another photo refers to by now (committed
+        by a concurrent request, say) are kept.
+        """
+        stored = {photo.image.name: photo for photo in photos if photo.image.name in self.created}
+        self.created.difference_update(stored)
+        try:
+            in_use = set(Photo.objects.filter(image__in=stored).values_list('image', flat=True))
+        except Exception as e:
+            # Without knowing, keep the files; unreferenced ones are only wasted space
+            logger.warning(f"Photo batch: kept {len(stored)} stored files: {str(e)}")
+            return
+        for name, photo in stored.items():
+            if name not in in_use:
+                delete_renditions(photo.renditions, photo.image.storage)
+                photo.image.delete(save=False)
+
+
+def start_photo_batch(items):
+    """Resolve the batch's projects and start importing it on the worker pool"""
+    batch = PhotoBatch(items)
+    return start_job(batch.prepare, range(len(items)), finish=batch.save)
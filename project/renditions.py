@@ -0,0 +1,133 @@
+"""
+Pre-generated, resized copies of uploaded photos.
+
+Renditions are written once when a Photo gets a new image (and by the
+``generate_renditions`` management command for existing media), stored next
+to the original under ``project/photos/renditions/`` and recorded on
+``Photo.renditions`` so templates and the API can build ``srcset`` values
+without touching the files again.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger('django')
+
+DEFAULT_WIDTHS = (480, 960, 1600)
+DEFAULT_QUALITY = 82
+
+# Pillow format name -> (file extension, mime type)
+FORMATS = {
+    'JPEG': ('jpg', 'image/jpeg'),
+    'WEBP': ('webp', 'image/webp'),
+    'AVIF': ('avif', 'image/avif'),
+}
+
+# Format used by the plain <img srcset>; the others become <source> elements,
+# listed in order of preference
+FALLBACK_FORMAT = 'JPEG'
+SOURCE_FORMATS = ('AVIF', 'WEBP')
+
+
+# EXIF tag holding the camera orientation; values 5-8 rotate the image by 90 degrees
+EXIF_ORIENTATION = 0x0112
+
+
+def display_size(image):
+    """Width and height of an open PIL image once its EXIF orientation is applied"""
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def rendition_widths():
+    return sorted(getattr(settings, 'PHOTO_RENDITION_WIDTHS', DEFAULT_WIDTHS))
+
+
+def rendition_formats():
+    """Return the formats to generate, skipping those this Pillow build can't write"""
+    from PIL import Image
+
+    Image.init()
+    return [fmt for fmt in SOURCE_FORMATS + (FALLBACK_FORMAT,) if fmt in Image.SAVE]
+
+
+def rendition_name(image_name, width, fmt):
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'renditions', f"{stem}-{width}w.{FORMATS[fmt][0]}")
+
+
+def generate_renditions(image_field):
+    """
+    Decode the image once and write every width/format combination smaller than
+    the original. Returns the value to store in ``Photo.renditions``, or an empty
+    dict if the image could not be read.
+    """
+    from PIL import Image, ImageOps
+
+    storage = image_field.storage
+    quality = getattr(settings, 'PHOTO_RENDITION_QUALITY', DEFAULT_QUALITY)
+
+    try:
+        with image_field.open('rb') as f:
+            source = Image.open(f)
+            source = ImageOps.exif_transpose(source)
+            source.load()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not generate renditions for {image_field.name}: {str(e)}")
+        return {}
+
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'A' in source.getbands() else 'RGB')
+
+    files = []
+    for width in rendition_widths():
+        if width >= source.width:
+            break
+        height = round(source.height * width / source.width)
+        resized = source.resize((width, height), Image.LANCZOS)
+
+        for fmt in rendition_formats():
+            image = resized.convert('RGB') if fmt == 'JPEG' else resized
+            buffer = BytesIO()
+            image.save(buffer, fmt, quality=quality)
+            name = storage.save(rendition_name(image_field.name, width, fmt), ContentFile(buffer.getvalue()))
+            files.append({'width': width, 'height': height, 'format': fmt, 'name': name})
+
+    return {'source': image_field.name, 'files': files}
+
+
+def delete_renditions(renditions, storage):
+    for rendition in renditions.get('files', []):
+        storage.delete(rendition['name'])
+
+
+def build_srcset(renditions, storage, fmt):
+    return ', '.join(
+        f"{storage.url(rendition['name'])} {rendition['width']}w"
+        for rendition in renditions.get('files', [])
+        if rendition['format'] == fmt
+    )
+
+
+def smallest_rendition(renditions, fmt=FALLBACK_FORMAT):
+    """The narrowest rendition, in ``fmt`` if there is one in it, or None"""
+    files = renditions.get('files', [])
+    return min([r for r in files if r['format'] == fmt] or files, key=lambda r: r['width'], default=None)
+
+
+def rendition_urls(renditions, storage):
+    return [
+        {
+            'width': rendition['width'],
+            'height': rendition['height'],
+            'format': rendition['format'],
+            'url': storage.url(rendition['name']),
+        }
+        for rendition in renditions.get('files', [])
+    ]
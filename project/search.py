@@ -0,0 +1,92 @@
+"""
+Full-text search over projects with an SQLite FTS5 index.
+
+The project_search table (created by migration 0009) holds the searchable text
+of every project under its id: name, description (the plain text), client,
+architect, builder and site, tokenized with accents folded so "felix" finds
+"Félix". It's kept in sync by the Project save/delete signals below and by the
+CSV importer, which indexes each bulk-inserted chunk at once. Matches are
+ranked with bm25, weighing the name most.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Project
+
+SEARCH_TABLE = 'project_search'
+INDEXED_FIELDS = ['name', 'description', 'client', 'architect', 'builder', 'site']
+# bm25 weight of each of INDEXED_FIELDS
+FIELD_WEIGHTS = [10.0, 1.0, 3.0, 3.0, 2.0, 2.0]
+
+RANK = f"bm25({SEARCH_TABLE}, {', '.join(map(str, FIELD_WEIGHTS))})"
+
+
+def match_expression(query):
+    """
+    FTS5 query matching every word of ``query`` as a prefix, or None if it has no
+    words. Words are quoted, so FTS5 operators typed by users are just text.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def document(project):
+    return [getattr(project, field) or '' for field in INDEXED_FIELDS]
+
+
+def index_projects(projects):
+    """Add or replace the index entries of ``projects``"""
+    rows = [(project.id, *document(project)) for project in projects]
+    if not rows:
+        return
+    placeholders = ', '.join(['%s'] * (len(INDEXED_FIELDS) + 1))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) VALUES ({placeholders})",
+            rows,
+        )
+
+
+def unindex_projects(project_ids):
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(i,) for i in project_ids])
+
+
+def search(query, offset=0, limit=20):
+    """Ids of the projects matching ``query``, best first, and the total number of matches"""
+    match = match_expression(query)
+    if match is None:
+        return [], 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [match])
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY {RANK} LIMIT %s OFFSET %s",
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()], total
+
+
+def filter_projects(queryset, query):
+    """``queryset`` restricted to the projects matching ``query``, using the index"""
+    match = match_expression(query)
+    if match is None:
+        return queryset.none()
+    return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+                                         [match]))
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, **kwargs):
+    index_projects([instance])
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    unindex_projects([instance.pk])
@@ -18,13 +18,14 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Handle error cases
     img.addEventListener('error', function() {
-      // Replace broken images with a no-image div
-      const container = img.parentElement;
+      // Replace broken images (and their <picture> wrapper) with a no-image div
+      const element = img.closest('picture') || img;
+      const container = element.parentElement;
       const noImage = document.createElement('div');
       noImage.className = 'no-image';
       noImage.textContent = 'Image not available';
       
-      container.replaceChild(noImage, img);
+      container.replaceChild(noImage, element);
     });
   });
 }); 
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Content-addressed media storage for photos.
+
+Files are stored under the SHA-256 of their content (``<dir>/ab/cdef….jpg``), so
+saving bytes that are already stored keeps nothing new and returns the
+existing name. Re-importing the same photos leaves disk usage flat, and since
+stored files never change they can be shared by any number of photos.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+import threading
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.stats = {'stored': 0, 'reused': 0, 'bytes_saved': 0}
+
+    def content_name(self, name, digest):
+        """Name under which content with ``digest`` is stored, in ``name``'s directory"""
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest[2:] + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content; equal names mean equal files
+        return name
+
+    def store(self, name, content):
+        """
+        Save ``content`` and return ``(name, created, digest)``: ``created`` is False
+        for a duplicate and ``digest`` is the hex SHA-256 the name is made of.
+        """
+        # The content is read once: hashed while it's written to a temporary file,
+        # which is then hard-linked under its digest, so the blob appears complete
+        # or not at all and concurrent writers of the same content don't clash
+        temp_path, digest, size = self._write_temporary(posixpath.dirname(name), content)
+        try:
+            name = self.content_name(name, digest)
+            created = self._link(temp_path, name)
+        finally:
+            os.unlink(temp_path)
+        with self._stats_lock:
+            if created:
+                self.stats['stored'] += 1
+            else:
+                self.stats['reused'] += 1
+                self.stats['bytes_saved'] += size
+        return name, created, digest
+
+    def _save(self, name, content):
+        return self.store(name, content)[0]
+
+    def _write_temporary(self, directory, content):
+        directory = self.path(directory)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return temp_path, digest.hexdigest(), size
+
+    def _link(self, temp_path, name):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return False
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        try:
+            os.link(temp_path, full_path)
+        except FileExistsError:
+            return False
+        return True
+
+
+photo_storage = ContentAddressedStorage()
+
+
+def get_photo_storage():
+    return photo_storage
@@ -1,3 +1,1241 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from fastapi.testclient import TestClient
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from .models import Project, Photo
 
 # Create your tests here.
+
+def create_project_with_cover(name):
+    project = Project.objects.create(name=name)
+    Photo.objects.create(title=f'{name} cover', project=project, is_cover_image=True,
+                         image=f'project/photos/{name}.jpg')
+    Photo.objects.create(title=f'{name} other', project=project,
+                         image=f'project/photos/{name}_2.jpg')
+    return project
+
+
+class CoverImageQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def count_home_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_home_query_count_does_not_grow_with_projects(self):
+        for i in range(3):
+            create_project_with_cover(f'small_{i}')
+        small = self.count_home_queries()
+
+        for i in range(20):
+            create_project_with_cover(f'large_{i}')
+        large = self.count_home_queries()
+
+        self.assertEqual(small, large)
+
+    def test_home_renders_cover_images(self):
+        create_project_with_cover('Cascais')
+        Project.objects.create(name='Sem foto')
+
+        response = self.client.get(reverse('home'))
+
+        self.assertContains(response, '/media/project/photos/Cascais.jpg', count=1)
+        self.assertContains(response, 'No Image', count=1)
+
+    def test_project_page_cover_image(self):
+        project = create_project_with_cover('Benavente')
+
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                Project.objects.with_cover_image().get(id=project.id).cover_image(),
+                '/media/project/photos/Benavente.jpg',
+            )
+
+        response = self.client.get(reverse('project', args=[project.id]))
+        self.assertContains(response, 'class="main-image"', count=1)
+
+
+def jpeg_file(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (120, 90, 60)).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+class MediaRootMixin:
+    """Writes uploaded files to a throwaway MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class MediaRootTestCase(MediaRootMixin, TestCase):
+    pass
+
+
+class APIClientMixin:
+    """
+    FastAPI test client authenticated with a DRF token. The API runs its ORM calls on
+    other threads, so use it with TransactionTestCase.
+    """
+
+    def setUp(self):
+        super().setUp()
+        from .api import app
+        from .auth import token_cache
+        token_cache.clear()
+        user = User.objects.create_user('api', password='api')
+        token = Token.objects.create(user=user)
+        self.api = TestClient(app)
+        self.api.headers['Authorization'] = f'Bearer {token.key}'
+
+
+@override_settings(PHOTO_RENDITION_WIDTHS=[480, 960, 1600])
+class RenditionTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.project = Project.objects.create(name='Parede')
+
+    def test_upload_generates_renditions_smaller_than_original(self):
+        photo = Photo(title='Fachada', project=self.project, is_cover_image=True)
+        photo.image.save('fachada.jpg', jpeg_file(1200, 800), save=True)
+
+        photo.refresh_from_db()
+        files = photo.renditions['files']
+        self.assertEqual(photo.renditions['source'], photo.image.name)
+        self.assertEqual(sorted({f['width'] for f in files}), [480, 960])
+        names = {(f['width'], f['format']): f['name'] for f in files}
+        self.assertIn({'width': 480, 'height': 320, 'format': 'WEBP', 'name': names[480, 'WEBP']}, files)
+        self.assertTrue(names[480, 'WEBP'].endswith('.webp'))
+        for rendition in files:
+            self.assertTrue(photo.image.storage.exists(rendition['name']))
+
+        self.assertEqual(photo.srcset, f'/media/{names[480, "JPEG"]} 480w, /media/{names[960, "JPEG"]} 960w')
+        self.assertIn({'type': 'image/webp', 'srcset': f'/media/{names[480, "WEBP"]} 480w, '
+                                                       f'/media/{names[960, "WEBP"]} 960w'},
+                      photo.sources)
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'srcset="/media/{names[480, "JPEG"]} 480w')
+
+    def test_upload_records_display_size(self):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees
+        Image.new('RGB', (1200, 800)).save(buffer, 'JPEG', exif=exif)
+        photo = Photo(title='Rodada', project=self.project)
+        photo.image.save('rodada.jpg', ContentFile(buffer.getvalue()), save=True)
+
+        photo.refresh_from_db()
+        self.assertEqual((photo.width, photo.height), (800, 1200))
+        self.assertEqual({(f['width'], f['height']) for f in photo.renditions['files']}, {(480, 720)})
+
+    def test_upload_records_metadata(self):
+        photo = Photo(title='Cor', project=self.project)
+        photo.image.save('cor.jpg', jpeg_file(1200, 800), save=True)
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.file_size, photo.image.size)
+        self.assertEqual(len(photo.blurhash), 28)
+        r, g, b = (int(photo.dominant_color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertTrue(all(abs(actual - expected) <= 4 for actual, expected in zip((r, g, b), (120, 90, 60))))
+
+    def test_blurhash_matches_reference_encoder(self):
+        from .metadata import blurhash
+        image = Image.new('RGB', (8, 6))
+        image.putdata([((x * 32) % 256, (y * 40) % 256, 128) for y in range(6) for x in range(8)])
+        # Reference value from the blurhash-python encoder
+        self.assertEqual(blurhash(image), 'LjF=ad3Ba|xuzONLfQnTeqf7fQf7')
+
+    def test_metadata_backfill_command(self):
+        photos = [Photo.objects.create(title=f'Antiga {i}', project=self.project) for i in range(3)]
+        photos[0].image.save('antiga.jpg', jpeg_file(1000, 500), save=False)
+        Photo.objects.filter(pk__in=[p.pk for p in photos[:2]]).update(image=photos[0].image.name)
+        Photo.objects.filter(pk=photos[2].pk).update(image='project/photos/missing.jpg')
+
+        out, err = StringIO(), StringIO()
+        with self.assertNumQueries(2):
+            # One read, one bulk UPDATE
+            call_command('backfill_photo_metadata', workers=2, stdout=out, stderr=err)
+
+        self.assertIn('Recorded metadata for 2 photos (1 failed)', out.getvalue())
+        self.assertIn('missing.jpg', err.getvalue())
+        self.assertEqual(Photo.objects.filter(width=1000, height=500, file_size=photos[0].image.size)
+                         .exclude(blurhash='').count(), 2)
+
+    def test_commands_refresh_cached_home_cards(self):
+        photo = Photo(title='Capa', project=self.project, is_cover_image=True)
+        photo.image.save('capa.jpg', jpeg_file(1000, 500), save=True)
+        Photo.objects.filter(pk=photo.pk).update(renditions={}, blurhash='', dominant_color='', width=None)
+        self.assertNotContains(self.client.get(reverse('home')), 'data-blurhash')
+
+        call_command('backfill_photo_metadata', stdout=StringIO())
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'data-blurhash="{Photo.objects.get().blurhash}"')
+        self.assertNotContains(response, 'srcset')
+
+        call_command('generate_renditions', stdout=StringIO())
+        self.assertContains(self.client.get(reverse('home')), 'srcset')
+
+    def test_backfill_command(self):
+        photo = Photo.objects.create(title='Antiga', project=self.project)
+        photo.image.save('antiga.jpg', jpeg_file(1000, 500), save=False)
+        Photo.objects.filter(pk=photo.pk).update(image=photo.image.name)
+
+        call_command('generate_renditions', stdout=StringIO())
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.renditions['source'], photo.image.name)
+        self.assertEqual(sorted({f['width'] for f in photo.renditions['files']}), [480, 960])
+
+
+class ContentAddressedStorageTests(MediaRootTestCase):
+    def test_duplicate_content_is_stored_once(self):
+        from .storage import ContentAddressedStorage
+        storage = ContentAddressedStorage()
+        content = jpeg_file(100, 100).read()
+
+        first = storage.save('project/photos/a.JPG', ContentFile(content))
+        duplicate = ContentFile(content)
+        with patch.object(duplicate, 'chunks', wraps=duplicate.chunks) as chunks:
+            second, created, digest = storage.store('project/photos/b.jpg', duplicate)
+        chunks.assert_called_once()
+
+        self.assertEqual(digest, hashlib.sha256(content).hexdigest())
+        self.assertEqual(first, f'project/photos/{digest[:2]}/{digest[2:]}.jpg')
+        self.assertEqual((second, created), (first, False))
+        self.assertEqual(storage.stats, {'stored': 1, 'reused': 1, 'bytes_saved': len(content)})
+        with storage.open(first) as f:
+            self.assertEqual(f.read(), content)
+
+    def test_replacing_an_image_keeps_shared_renditions(self):
+        project = Project.objects.create(name='Partilhada')
+        content = jpeg_file(1000, 500).read()
+        photos = []
+        for title in ('A', 'B'):
+            photo = Photo(title=title, project=project)
+            photo.image.save('partilhada.jpg', ContentFile(content), save=True)
+            photos.append(photo)
+        self.assertEqual(photos[0].renditions, photos[1].renditions)
+
+        photos[0].image.save('outra.jpg', jpeg_file(1000, 400), save=True)
+
+        for rendition in photos[1].renditions['files']:
+            self.assertTrue(photos[1].image.storage.exists(rendition['name']))
+
+
+class PhotoBatchJobTests(APIClientMixin, MediaRootMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(name='Lisboa')
+
+    def write_source(self, name, content=None):
+        path = f'{self.media_root}/{name}'
+        with open(path, 'wb') as f:
+            f.write(content if content is not None else jpeg_file(600, 400).read())
+        return path
+
+    def test_batch_returns_job_and_reports_item_progress(self):
+        from .jobs import get_job
+
+        photos = [
+            {"title": "A", "catalog": "Lisboa", "image_path": self.write_source('a.jpg')},
+            {"title": "B", "project_id": self.project.id, "image_path": self.write_source('b.jpg')},
+            {"title": "Corrupt", "catalog": "Lisboa", "image_path": self.write_source('c.jpg', b'not an image')},
+            {"title": "Missing", "catalog": "Lisboa", "image_path": f'{self.media_root}/missing.jpg'},
+            {"image_path": self.write_source('d.jpg')},
+        ]
+        response = self.api.post('/photos/batch/', json=photos)
+        self.assertEqual(response.status_code, 200)
+        job_id = response.json()['job_id']
+        self.assertEqual(response.json()['total'], 5)
+
+        self.assertTrue(get_job(job_id).wait(timeout=30))
+        status = self.api.get(f'/photos/batch/{job_id}/').json()
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual((status['done'], status['failed'], status['pending']), (2, 3, 0))
+        self.assertEqual([item['status'] for item in status['items']], ['done', 'done', 'failed', 'failed', 'failed'])
+        self.assertIn('Invalid image file', status['items'][2]['error'])
+        self.assertEqual(Photo.objects.filter(project=self.project).count(), 2)
+
+    def test_batch_wait_returns_results(self):
+        photos = [{"title": "A", "catalog": "Lisboa", "image_path": self.write_source('a.jpg')}]
+        result = self.api.post('/photos/batch/?wait=true', json=photos).json()
+
+        self.assertEqual(result['errors'], [])
+        self.assertEqual([r['project_name'] for r in result['results']], ['Lisboa'])
+
+    def test_unknown_job(self):
+        self.assertEqual(self.api.get('/photos/batch/unknown/').status_code, 404)
+
+    def test_status_of_a_job_started_by_another_process(self):
+        from . import jobs
+
+        photos = [{"title": "A", "catalog": "Lisboa", "image_path": self.write_source('a.jpg')}]
+        job_id = self.api.post('/photos/batch/', json=photos).json()['job_id']
+        self.assertTrue(jobs.get_job(job_id).wait(timeout=30))
+
+        # Only the snapshot published to the shared cache is left
+        with patch.dict(jobs._jobs, clear=True):
+            status = self.api.get(f'/photos/batch/{job_id}/').json()
+        self.assertEqual((status['status'], status['done'], status['total']), ('completed', 1, 1))
+
+    def test_wait_for_jobs(self):
+        import threading
+        from . import jobs
+
+        release = threading.Event()
+        with patch.dict(jobs._jobs, clear=True):
+            job = jobs.start_job(lambda item: release.wait(10), [1, 2])
+            with self.assertLogs('django', 'WARNING'):
+                self.assertFalse(jobs.wait_for_jobs(0.05))
+            release.set()
+            self.assertTrue(jobs.wait_for_jobs(10, interval=0.01))
+        self.assertEqual(job.as_dict()['done'], 2)
+
+
+class PhotoBatchImportTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lisboa = Project.objects.create(name='Lisboa')
+        self.porto = Project.objects.create(name='Porto')
+
+    def write_sources(self, count):
+        paths = []
+        for i in range(count):
+            path = f'{self.media_root}/source_{i}.jpg'
+            with open(path, 'wb') as f:
+                f.write(jpeg_file(300, 200).read())
+            paths.append(path)
+        return paths
+
+    def run_batch(self, items, lookups, queries):
+        from .photo_import import PhotoBatch
+        with self.assertNumQueries(lookups):
+            batch = PhotoBatch(items)
+        with self.assertNumQueries(0):
+            results = {i: batch.prepare(i) for i in range(len(items))}
+        with self.assertNumQueries(queries):
+            return batch.save(results)
+
+    def test_batch_costs_constant_queries(self):
+        items = [{"title": f"P{i}", "catalog": "Lisboa" if i % 2 else "", "project_id": self.porto.id,
+                  "image_path": path} for i, path in enumerate(self.write_sources(40))]
+
+        # Savepoint, insert, release
+        results = self.run_batch(items, lookups=2, queries=3)
+
+        self.assertEqual(Photo.objects.filter(project=self.lisboa).count(), 20)
+        self.assertEqual(Photo.objects.filter(project=self.porto).count(), 20)
+        self.assertEqual(results[1]['project_name'], 'Lisboa')
+        self.assertEqual(results[0]['id'], Photo.objects.get(title='P0').id)
+        self.assertEqual(Photo.objects.filter(width=300, height=200).exclude(blurhash='').count(), 40)
+
+    def test_cover_conflicts_resolved_once_per_project(self):
+        old_cover = Photo.objects.create(title='Antiga', project=self.lisboa, is_cover_image=True,
+                                         image='project/photos/antiga.jpg')
+        first, second, third = self.write_sources(3)
+        items = [
+            {"title": "Primeira", "catalog": "Lisboa", "is_cover_image": True, "image_path": first},
+            {"title": "Segunda", "catalog": "Lisboa", "is_cover_image": True, "image_path": second},
+            {"title": "Porto", "catalog": "Porto", "is_cover_image": True, "image_path": third},
+        ]
+
+        self.run_batch(items, lookups=1, queries=4)
+
+        self.assertEqual(list(Photo.objects.filter(is_cover_image=True).order_by('title')
+                              .values_list('title', flat=True)), ['Porto', 'Segunda'])
+        old_cover.refresh_from_db()
+        self.assertFalse(old_cover.is_cover_image)
+
+    def test_ambiguous_and_unknown_projects(self):
+        from .photo_import import resolve_projects
+        Project.objects.create(name='Lisboa')
+        projects = resolve_projects([{"catalog": "Lisboa"}, {"catalog": "Faro", "project_id": 999},
+                                     {"project_id": "abc"}, {"catalog": "Porto"}])
+
+        self.assertIn('More than one project', str(projects[0]))
+        self.assertIn('Project not found', str(projects[1]))
+        self.assertIn('Project not found', str(projects[2]))
+        self.assertEqual(projects[3], self.porto)
+
+    def test_reimport_reuses_stored_files_and_renditions(self):
+        import os
+        from .photo_import import PhotoBatch
+
+        items = [{"title": f"P{i}", "catalog": "Lisboa", "image_path": path}
+                 for i, path in enumerate(self.write_sources(2))]
+        first = self.run_batch(items, lookups=1, queries=3)
+        stored = sorted(os.path.join(d, f) for d, _, files in os.walk(self.media_root) for f in files)
+
+        batch = PhotoBatch(items)
+        with self.assertNumQueries(4):
+            # One renditions lookup (both sources have the same content), then the insert
+            second = batch.save({i: batch.prepare(i) for i in range(len(items))})
+
+        self.assertEqual(sorted(os.path.join(d, f) for d, _, files in os.walk(self.media_root) for f in files),
+                         stored)
+        self.assertEqual([r['deduplicated'] for r in first.values()], [False, True])
+        self.assertEqual([r['deduplicated'] for r in second.values()], [True, True])
+        self.assertEqual(second[0]['srcset'], first[0]['srcset'])
+        self.assertEqual(Photo.objects.values('image').distinct().count(), 1)
+
+    def test_failed_batch_keeps_files_other_photos_use(self):
+        from django.db import IntegrityError
+        from .photo_import import PhotoBatch
+
+        first, second = self.write_sources(2)
+        with open(second, 'wb') as f:
+            f.write(jpeg_file(300, 100).read())
+        batch = PhotoBatch([{"title": f"P{i}", "catalog": "Lisboa", "image_path": path}
+                            for i, path in enumerate([first, second])])
+        results = {i: batch.prepare(i) for i in range(2)}
+        shared, own = batch.photos[0], batch.photos[1]
+        own_files = [own.image.name] + [r['name'] for r in own.renditions['files']]
+        # Saved by another request while this batch ran
+        Photo.objects.create(title='Outra', project=self.porto, image=shared.image.name)
+
+        with patch.object(Photo.objects, 'bulk_create', side_effect=IntegrityError('disk I/O error')):
+            with self.assertRaises(IntegrityError):
+                batch.save(results)
+
+        storage = shared.image.storage
+        self.assertTrue(storage.exists(shared.image.name))
+        self.assertTrue(all(storage.exists(r['name']) for r in shared.renditions['files']))
+        self.assertFalse(any(storage.exists(name) for name in own_files))
+
+    def test_job_items_fail_when_finish_raises(self):
+        from .jobs import start_job
+
+        def finish(results):
+            raise ValueError('database is locked')
+
+        job = start_job(lambda item: item * 2, [1, 2], finish=finish)
+        self.assertTrue(job.wait(timeout=30))
+        self.assertEqual(job.results(), {'results': [], 'errors': [{'index': 0, 'error': 'database is locked'},
+                                                                     {'index': 1, 'error': 'database is locked'}]})
+
+
+class PhotoUploadTests(APIClientMixin, MediaRootMixin, TransactionTestCase):
+    def test_upload_streams_file_into_storage(self):
+        project = Project.objects.create(name='Carcavelos')
+        content = jpeg_file(800, 600).read()
+
+        response = self.api.post('/photos/', data={'title': 'Sala', 'project_id': project.id},
+                                 files={'image': ('sala.jpg', content, 'image/jpeg')})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['size'], len(content))
+        self.assertEqual(data['sha256'], hashlib.sha256(content).hexdigest())
+        photo = Photo.objects.get(id=data['id'])
+        with photo.image.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_upload_unknown_project(self):
+        response = self.api.post('/photos/', data={'title': 'Sala', 'project_id': 999},
+                                 files={'image': ('sala.jpg', b'x', 'image/jpeg')})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Photo.objects.exists())
+
+
+class CSVImportTests(TestCase):
+    def import_csv(self, text, **kwargs):
+        from .csv_import import import_projects
+        return import_projects(BytesIO(text.encode('utf-8')), **kwargs)
+
+    def test_import_handles_quotes_newlines_and_row_errors(self):
+        result = self.import_csv(
+            'name,description,client,architect,builder,site,project_year,extra\r\n'
+            'Casa,"Linha 1\nLinha ""2""",C,A,B,Lisboa,1999,x\r\n'
+            '\r\n'
+            'Sem cliente,,,A,B,Lisboa,2001,\r\n'
+            'Ano errado,,C,A,B,Porto,abc,\r\n',
+            chunk_size=1,
+        )
+
+        self.assertEqual(len(result['project_ids']), 2)
+        self.assertEqual(result['errors'], [{'line': 5, 'error': 'Missing required fields: client'}])
+        self.assertEqual(result['ignored_columns'], ['extra'])
+        casa = Project.objects.get(name='Casa')
+        self.assertEqual(casa.description, 'Linha 1\nLinha "2"')
+        self.assertEqual(casa.description_html, '<p>Linha 1<br>Linha "2"</p>')
+        self.assertEqual(casa.project_year, 1999)
+        self.assertIsNone(Project.objects.get(name='Ano errado').project_year)
+
+    def test_import_is_chunked_bulk_inserts(self):
+        rows = ''.join(f'P{i},C,A,B,S\n' for i in range(50))
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.import_csv('name,client,architect,builder,site\n' + rows, chunk_size=25)
+
+        self.assertEqual(len(result['project_ids']), 50)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_import_rejects_existing_ids(self):
+        existing = Project.objects.create(name='Existente')
+        result = self.import_csv(f'id,name,client,architect,builder,site\n{existing.id},Dup,C,A,B,S\n')
+
+        self.assertEqual(result['project_ids'], [])
+        self.assertIn('already exists', result['errors'][0]['error'])
+
+    def test_out_of_range_integers_are_row_errors(self):
+        result = self.import_csv('name,client,architect,builder,site,project_year\n'
+                                 f'Enorme,C,A,B,S,{2 ** 63}\n'
+                                 'Normal,C,A,B,S,2001\n')
+
+        self.assertEqual(result['errors'], [{'line': 2, 'error': 'Value out of range: project_year'}])
+        self.assertEqual(list(Project.objects.values_list('name', flat=True)), ['Normal'])
+
+    def test_rows_rejected_by_the_database_are_reported(self):
+        from django.db import IntegrityError
+        bulk_create = Project.objects.bulk_create
+
+        def reject_ruim(projects, *args, **kwargs):
+            if any(project.name == 'Ruim' for project in projects):
+                raise IntegrityError('CHECK constraint failed')
+            return bulk_create(projects, *args, **kwargs)
+
+        with patch.object(Project.objects, 'bulk_create', side_effect=reject_ruim):
+            result = self.import_csv('name,client,architect,builder,site\nBom,C,A,B,S\nRuim,C,A,B,S\nOutro,C,A,B,S\n')
+
+        self.assertEqual(result['errors'], [{'line': 3, 'error': 'CHECK constraint failed'}])
+        self.assertEqual(len(result['project_ids']), 2)
+        self.assertEqual(set(Project.objects.values_list('name', flat=True)), {'Bom', 'Outro'})
+
+    def test_missing_column(self):
+        from .csv_import import CSVImportError
+        with self.assertRaisesMessage(CSVImportError, 'Missing required column: site'):
+            self.import_csv('name,client,architect,builder\n')
+
+
+class CSVImportAPITests(APIClientMixin, TransactionTestCase):
+    def test_import_endpoint(self):
+        csv_content = b'\xef\xbb\xbfname,client,architect,builder,site\nCasa,C,A,B,S\nFalta,C,A,B,\n'
+        response = self.api.post('/projects/import-csv/', files={'file': ('p.csv', csv_content, 'text/csv')})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], 'Successfully imported 1 projects')
+        self.assertEqual(response.json()['errors'], [{'line': 3, 'error': 'Missing required fields: site'}])
+
+        response = self.api.post('/projects/import-csv/', files={'file': ('p.csv', b'', 'text/csv')})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'], 'Empty CSV file')
+
+
+class ExportAPITests(APIClientMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        Project.objects.create(name='Casa, "Azul"', description='Uma\nduas', client='C', project_year=1999)
+        Project.objects.create(name='Escritórios', client='CP', public_private_project=1)
+
+    def test_csv_export(self):
+        from .exports import EXPORT_FIELDS
+        response = self.api.get('/projects/export-csv/', headers={'Accept-Encoding': 'identity'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], 'text/csv; charset=utf-8')
+        self.assertNotIn('content-encoding', response.headers)
+        self.assertEqual(response.text.splitlines()[0], ','.join(EXPORT_FIELDS))
+        # The plain description, so an exported file imports back unchanged
+        self.assertIn('"Casa, ""Azul""","Uma\nduas",C,1999,,,,,0,', response.text)
+
+    @override_settings(API_SYNC_THREADS=None)
+    def test_export_reads_keyset_chunks(self):
+        from asgiref.sync import async_to_sync
+        from .exports import stream_projects
+
+        async def collect():
+            return [chunk async for chunk in stream_projects('ndjson', chunk_size=1)]
+
+        with self.assertNumQueries(3):
+            chunks = async_to_sync(collect)()
+        self.assertEqual([len(chunk.splitlines()) for chunk in chunks], [0, 1, 1])
+
+    def test_ndjson_export_gzip(self):
+        response = self.api.get('/projects/export-csv/?format=ndjson', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Casa, "Azul"', 'Escritórios'])
+        self.assertEqual(rows[1]['public_private_project'], 1)
+
+    def test_gzip_refused_by_q_value(self):
+        response = self.api.get('/projects/export-csv/', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+
+        self.assertNotIn('content-encoding', response.headers)
+        self.assertEqual(response.headers['vary'], 'Accept-Encoding')
+        self.assertTrue(response.text.startswith('id,name'))
+
+    def test_accepts_gzip(self):
+        from .exports import accepts_gzip
+        for header, expected in [('gzip', True), ('deflate, GZIP;q=0.5', True), ('br;q=1, *;q=0.1', True),
+                                 ('gzip;q=0', False), ('gzip; q=0.000, *', False), ('*;q=0', False),
+                                 ('identity', False), ('', False), (None, False), ('gzipped', False)]:
+            self.assertEqual(accepts_gzip(header), expected, header)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.api.get('/projects/export-csv/?format=xml').status_code, 400)
+
+
+@override_settings(GALLERY_PAGE_SIZE=4)
+class GalleryTests(APIClientMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.project = Project.objects.create(name='Galeria')
+        for i in range(10):
+            Photo.objects.create(title=f'Foto {i}', project=self.project, index=10 - i,
+                                 image=f'project/photos/foto_{i}.jpg')
+        Photo.objects.update(width=300, height=200, file_size=4000, dominant_color='#785a3c',
+                             blurhash='LEHV6nWB2yk8pyo0adR*.7kCMdnj')
+
+    def test_gallery_renders_one_lazy_page_in_index_order(self):
+        response = self.client.get(reverse('project', args=[self.project.id]))
+
+        content = response.content.decode()
+        titles = [f'Foto {i}' for i in (9, 8, 7, 6)]
+        positions = [content.index(f'alt="{title}"') for title in titles]
+        self.assertEqual(positions, sorted(positions))
+        self.assertNotIn('alt="Foto 5"', content)
+        self.assertEqual(content.count('loading="lazy"'), 4)
+        self.assertContains(response, 'width="300" height="200"', count=4)
+        self.assertContains(response, 'style="background-color: #785a3c" '
+                                      'data-blurhash="LEHV6nWB2yk8pyo0adR*.7kCMdnj"', count=4)
+        self.assertContains(response, 'href="?page=2"')
+        self.assertContains(response, f'data-photos-url="/api/projects/{self.project.id}/photos/" '
+                                      f'data-next-offset="4" data-total="10" data-page-size="4"')
+
+        response = self.client.get(reverse('project', args=[self.project.id]), {'page': 3})
+        self.assertContains(response, 'alt="Foto 0"')
+        self.assertNotContains(response, 'href="?page=4"')
+
+    def test_api_pages_photos_in_index_order(self):
+        photos = self.api.get(f'/projects/{self.project.id}/photos/?offset=4&limit=4').json()
+
+        self.assertEqual([p['title'] for p in photos], ['Foto 5', 'Foto 4', 'Foto 3', 'Foto 2'])
+        self.assertEqual((photos[0]['width'], photos[0]['height']), (300, 200))
+        self.assertEqual((photos[0]['file_size'], photos[0]['dominant_color'], photos[0]['blurhash']),
+                         (4000, '#785a3c', 'LEHV6nWB2yk8pyo0adR*.7kCMdnj'))
+        self.assertEqual(len(self.api.get(f'/projects/{self.project.id}/photos/').json()), 10)
+
+
+class ProjectListAPITests(APIClientMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.projects = [
+            Project.objects.create(name=f'P{i}', description='texto longo', client='C',
+                                   project_year=1990 + i, construction_year=1995 + i if i % 2 else None,
+                                   public_private_project=i % 2)
+            for i in range(5)
+        ]
+
+    def test_cursor_pagination(self):
+        first = self.api.get('/projects/list/?limit=2').json()
+        self.assertEqual([p['name'] for p in first['results']], ['P0', 'P1'])
+        self.assertEqual(first['results'][0]['description'], 'texto longo')
+        self.assertEqual(first['results'][0]['description_html'], '<p>texto longo</p>')
+
+        second = self.api.get(f"/projects/list/?limit=2&cursor={first['next_cursor']}").json()
+        third = self.api.get(f"/projects/list/?limit=2&cursor={second['next_cursor']}").json()
+        self.assertEqual([p['name'] for p in second['results'] + third['results']], ['P2', 'P3', 'P4'])
+        self.assertIsNone(third['next_cursor'])
+
+    def test_fields_projection(self):
+        results = self.api.get('/projects/list/?fields=name,project_year').json()['results']
+        self.assertEqual(results[0], {'id': self.projects[0].id, 'name': 'P0', 'project_year': 1990})
+
+        response = self.api.get('/projects/list/?fields=name,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters(self):
+        results = self.api.get('/projects/list/?public_private_project=1&fields=name').json()['results']
+        self.assertEqual([p['name'] for p in results], ['P1', 'P3'])
+
+        # P1/P3 use their construction year (1996/1998), the others their project year
+        results = self.api.get('/projects/list/?year_from=1992&year_to=1997&fields=name').json()['results']
+        self.assertEqual([p['name'] for p in results], ['P1', 'P2', 'P4'])
+
+        # Projects without a year don't match, whatever the range
+        Project.objects.create(name='Sem ano')
+        results = self.api.get('/projects/list/?year_to=1991&fields=name').json()['results']
+        self.assertEqual([p['name'] for p in results], ['P0'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.api.get('/projects/list/?cursor=???').status_code, 400)
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        from .auth import token_cache
+        token_cache.clear()
+        self.user = User.objects.create_user('api', password='api')
+        self.token = Token.objects.create(user=self.user)
+
+    def test_token_lookup_is_cached_and_invalidated(self):
+        from .auth import get_user_from_token
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_from_token(self.token.key), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_from_token(self.token.key), self.user)
+
+        key = self.token.key
+        self.token.delete()
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_user_from_token(key))
+
+    def test_user_change_invalidates_tokens(self):
+        from .auth import get_user_from_token, token_cache
+
+        get_user_from_token(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_lru_and_ttl(self):
+        from .auth import TokenCache
+
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.set('a', self.user)
+        cache.set('b', self.user)
+        cache.get('a')
+        cache.set('c', self.user)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (self.user, None, self.user))
+
+        expired = TokenCache(maxsize=2, ttl=-1)
+        expired.set('a', self.user)
+        self.assertIsNone(expired.get('a'))
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.project = create_project_with_cover('Abrantes')
+
+    def test_pages_are_cached_until_content_changes(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Abrantes')
+
+        self.project.name = 'Abrantes Moradias'
+        self.project.save()
+        self.assertContains(self.client.get(reverse('home')), 'Abrantes Moradias')
+
+    def test_only_changed_cards_are_rendered_again(self):
+        other = create_project_with_cover('Benavente')
+        self.client.get(reverse('home'))
+
+        Photo.objects.filter(project=other).update(title='sem sinal')
+        other.save()
+        with self.assertTemplateUsed('project/includes/picture.html', count=1):
+            self.client.get(reverse('home'))
+
+    def test_conditional_requests_get_304(self):
+        response = self.client.get(reverse('project', args=[self.project.id]))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(reverse('project', args=[self.project.id]),
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(reverse('about'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        Photo.objects.create(title='nova', project=self.project, image='project/photos/nova.jpg')
+        response = self.client.get(reverse('project', args=[self.project.id]),
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_project_is_not_cached(self):
+        self.assertEqual(self.client.get(reverse('project', args=[999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('project', args=[999])).status_code, 404)
+
+
+class APIPageCacheTests(APIClientMixin, TransactionTestCase):
+    def test_api_writes_bump_content_version(self):
+        from .cache import get_content_version
+        version = get_content_version()
+        self.api.post('/projects/import-csv/',
+                      files={'file': ('p.csv', b'name,client,architect,builder,site\nCasa,C,A,B,S\n', 'text/csv')})
+        self.assertGreater(get_content_version(), version)
+
+        version = get_content_version()
+        self.api.get('/projects/list/')
+        self.assertEqual(get_content_version(), version)
+
+
+class ASGIBridgeTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        from re_arqui.asgi import application
+        self.client = TestClient(application)
+        Project.objects.create(name='Madre Deus')
+
+    def test_routes_api_and_django(self):
+        response = self.client.get('/api/projects/list/?fields=name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['name'], 'Madre Deus')
+
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Madre Deus', response.text)
+
+        self.assertEqual(self.client.get('/api/docs').status_code, 200)
+        self.assertIn('/api/openapi.json', self.client.get('/api/docs').text)
+        self.assertEqual(self.client.get('/apiary/').status_code, 404)
+        self.assertEqual(self.client.get('/static/project/css/main.css').status_code, 200)
+
+
+class FileServingTests(MediaRootTestCase):
+    def store_photo(self, name, content):
+        from .storage import photo_storage
+        return photo_storage.save(name, ContentFile(content))
+
+    def test_hashed_static_files_are_immutable_and_precompressed(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        url = staticfiles_storage.url('project/css/main.css')
+        self.assertRegex(url, r'^/static/project/css/main\.[0-9a-f]{12}\.css$')
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response.close()
+
+    def test_content_addressed_media_supports_ranges(self):
+        content = jpeg_file(200, 100).read()
+        url = f'/media/{self.store_photo("project/photos/a.jpg", content)}'
+
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[:10])
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_other_media_revalidates(self):
+        from django.core.files.storage import FileSystemStorage
+        FileSystemStorage().save('project/photos/antiga.jpg', ContentFile(b'jpeg'))
+
+        response = self.client.get('/media/project/photos/antiga.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+        self.assertEqual(self.client.get('/media/project/photos/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/project/../../settings.py').status_code, 404)
+
+    def test_asgi_serves_files_before_django(self):
+        from re_arqui.asgi import application
+        content = jpeg_file(300, 100).read()
+        url = f'/media/{self.store_photo("project/photos/b.jpg", content)}'
+
+        with TestClient(application) as client:
+            response = client.get(url, headers={'Range': 'bytes=10-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, content[10:])
+        self.assertIn('immutable', response.headers['cache-control'])
+
+
+class ExecutorTests(TestCase):
+    def run_on_executor(self):
+        import threading
+        from asgiref.sync import async_to_sync
+        from .executor import run_sync
+        return async_to_sync(run_sync(lambda: threading.current_thread().name))()
+
+    @override_settings(API_SYNC_THREADS=2)
+    def test_sync_work_runs_on_configured_pool(self):
+        self.assertTrue(self.run_on_executor().startswith('re-arqui-api'))
+
+    @override_settings(API_SYNC_THREADS=None)
+    def test_thread_sensitive_without_pool(self):
+        import threading
+        self.assertEqual(self.run_on_executor(), threading.current_thread().name)
+
+
+class SQLiteBackendTests(TestCase):
+    def make_connection(self, path, timeout):
+        from re_arqui.sqlite3.base import DatabaseWrapper
+        settings_dict = dict(connection.settings_dict, NAME=path, OPTIONS={'timeout': timeout})
+        wrapper = DatabaseWrapper(settings_dict, alias=f'test_{id(settings_dict)}')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas_applied_to_new_connections(self):
+        path = f'{tempfile.mkdtemp()}/db.sqlite3'
+        self.addCleanup(shutil.rmtree, path.rsplit('/', 1)[0])
+        db = self.make_connection(path, timeout=1)
+        with db.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_busy_statements_are_retried_outside_transactions(self):
+        import threading
+        from django.db import OperationalError
+
+        path = f'{tempfile.mkdtemp()}/db.sqlite3'
+        self.addCleanup(shutil.rmtree, path.rsplit('/', 1)[0])
+        writer = self.make_connection(path, timeout=1)
+        writer.cursor().execute('CREATE TABLE t (x integer)')
+        other = self.make_connection(path, timeout=0.01)
+
+        writer.connection.execute('BEGIN IMMEDIATE')
+        with self.settings(SQLITE_BUSY_RETRIES=0):
+            with self.assertRaisesMessage(OperationalError, 'locked'):
+                other.cursor().execute('INSERT INTO t VALUES (1)')
+
+        release = threading.Timer(0.2, writer.connection.commit)
+        release.start()
+        self.addCleanup(release.join)
+        with self.settings(SQLITE_BUSY_RETRIES=6, SQLITE_BUSY_BACKOFF=0.05):
+            other.cursor().execute('INSERT INTO t VALUES (1)')
+        self.assertEqual(other.cursor().execute('SELECT count(*) FROM t').fetchone()[0], 1)
+
+    def test_persistent_connections_only_under_wsgi(self):
+        import subprocess
+        import sys
+
+        env = {key: value for key, value in os.environ.items() if key != 'DB_CONN_MAX_AGE'}
+        code = "import {}; from django.db import connection; print(connection.settings_dict['CONN_MAX_AGE'])"
+        for module, expected in [('re_arqui.asgi', '0'), ('re_arqui.wsgi', '600')]:
+            result = subprocess.run([sys.executable, '-c', code.format(module)], env=env,
+                                    capture_output=True, text=True, check=True)
+            self.assertEqual(result.stdout.strip(), expected, module)
+
+
+class DescriptionTests(TestCase):
+    def test_description_is_rendered_once_per_change(self):
+        project = Project.objects.create(name='Casa', description='Um\n\nDois')
+        self.assertEqual(project.description_html, '<p>Um</p>\n\n<p>Dois</p>')
+
+        project = Project.objects.get()
+        project.name = 'Casa Nova'
+        with patch('django.utils.html.linebreaks') as linebreaks:
+            project.save()
+            project.save(update_fields=['name'])
+        linebreaks.assert_not_called()
+
+        project.description = 'Três'
+        project.save(update_fields=['description'])
+        project.refresh_from_db()
+        self.assertEqual((project.description, project.description_html), ('Três', '<p>Três</p>'))
+
+        project.description = ''
+        project.save()
+        self.assertEqual(Project.objects.get().description_html, '')
+
+    def test_saving_other_fields_leaves_the_description_alone(self):
+        project = Project.objects.create(name='Casa', description='Um')
+        project.name = 'Casa Nova'
+        project.description = 'Dois'
+        project.save(update_fields=['name'])
+
+        project.refresh_from_db()
+        self.assertEqual((project.name, project.description, project.description_html),
+                         ('Casa Nova', 'Um', '<p>Um</p>'))
+
+    def test_project_page_shows_rendered_description(self):
+        project = Project.objects.create(name='Casa', description='Linha 1\nLinha 2')
+        self.assertContains(self.client.get(reverse('project', args=[project.id])), '<p>Linha 1<br>Linha 2</p>')
+
+
+class HomeOrderingIndexTests(TestCase):
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    def test_sort_year_follows_construction_then_project_year(self):
+        built = Project.objects.create(name='Obra', project_year=1990, construction_year=1995)
+        designed = Project.objects.create(name='Projeto', project_year=2001)
+        undated = Project.objects.create(name='Sem data')
+        self.assertEqual([built.sort_year, designed.sort_year, undated.sort_year], [1995, 2001, 0])
+
+        designed.construction_year = 2004
+        designed.save(update_fields=['construction_year'])
+        designed.refresh_from_db()
+        self.assertEqual(designed.sort_year, 2004)
+
+    def test_csv_import_sets_sort_year(self):
+        from .csv_import import import_projects
+        import_projects(BytesIO(b'name,client,architect,builder,site,project_year,construction_year\n'
+                                b'A,C,A,B,S,1999,\nB,C,A,B,S,1999,2003\n'))
+        self.assertEqual(dict(Project.objects.values_list('name', 'sort_year')), {'A': 1999, 'B': 2003})
+
+    def test_home_order_uses_index(self):
+        plan = self.query_plan(Project.objects.order_by('public_private_project', 'sort_year'))
+        self.assertIn('project_home_order_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_photo_lookups_use_indexes(self):
+        project = Project.objects.create(name='Indexado')
+        cover_plan = self.query_plan(Photo.objects.filter(project__in=[project.id], is_cover_image=True))
+        self.assertIn('photo_project_cover_idx', cover_plan)
+
+        gallery_plan = self.query_plan(Photo.objects.filter(project=project).order_by('index'))
+        self.assertIn('photo_project_index_idx', gallery_plan)
+        self.assertNotIn('TEMP B-TREE', gallery_plan)
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(APIClientMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.project = Project.objects.create(name='Métrica')
+
+    def test_django_requests_get_server_timing_and_histograms(self):
+        response = self.client.get(reverse('project', args=[self.project.id]))
+
+        timing = dict(part.strip().split(';', 1) for part in response['Server-Timing'].split(','))
+        self.assertIn('desc="3 queries"', timing['db'])
+        self.assertTrue(timing['tpl'].startswith('dur='))
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        token = Token.objects.get().key
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION=f'Token {token}')
+        labels = 'app="django",method="GET",route="project/<int:project_id>/"'
+        self.assertContains(response, f'http_request_db_queries_bucket{{{labels},le="5"}}')
+        self.assertContains(response, f'http_requests_total{{{labels},status="200"}}')
+        self.assertContains(response, f'http_request_template_duration_seconds_count{{{labels}}}')
+
+    def test_api_requests_are_recorded(self):
+        response = self.api.get(f'/projects/{self.project.id}/photos/')
+        self.assertIn('desc="2 queries"', response.headers['Server-Timing'])
+
+        response = self.api.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_response_size_bytes_count{app="fastapi",method="GET",'
+                      'route="/projects/{project_id}/photos/"} 1', response.text)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('about'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('server-timing', self.api.get('/projects/list/').headers)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertEqual(self.api.get('/metrics/').status_code, 404)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.felix = Project.objects.create(name='Casa do Lago', architect='Nuno Félix', site='Sintra',
+                                            description='Moradia junto ao lago.')
+        self.lago = Project.objects.create(name='Escola', client='Câmara', site='Lisboa',
+                                           description='Escola com vista sobre o lago.')
+
+    def test_ranked_prefix_search_ignores_accents_and_markup(self):
+        from .search import search
+        self.assertEqual(search('lago'), ([self.felix.id, self.lago.id], 2))
+        self.assertEqual(search('felix sint'), ([self.felix.id], 1))
+        self.assertEqual(search('camara'), ([self.lago.id], 1))
+        self.assertEqual(search('p'), ([], 0))  # <p> tags aren't indexed
+        self.assertEqual(search('lago', offset=1, limit=1), ([self.lago.id], 2))
+        self.assertEqual(search('"lago" OR NEAR('), ([], 0))
+        self.assertEqual(search('?!'), ([], 0))
+
+    def test_index_follows_saves_deletes_and_csv_imports(self):
+        from .csv_import import import_projects
+        from .search import search
+        self.lago.name = 'Liceu'
+        self.lago.save()
+        self.assertEqual(search('liceu'), ([self.lago.id], 1))
+        self.assertEqual(search('escola'), ([self.lago.id], 1))  # still in the description
+
+        self.felix.delete()
+        self.assertEqual(search('felix'), ([], 0))
+
+        result = import_projects(BytesIO('name,client,architect,builder,site\nArmazém,C,A,B,Porto\n'.encode()))
+        self.assertEqual(search('armazem'), (result['project_ids'], 1))
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser('admin', password='admin')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:project_project_changelist'), {'q': 'félix'})
+        self.assertContains(response, 'Casa do Lago')
+        self.assertNotContains(response, 'Escola')
+        self.assertTrue(any('MATCH' in query['sql'] for query in queries))
+        self.assertFalse(any('LIKE' in query['sql'] for query in queries))
+
+
+class SearchAPITests(APIClientMixin, TransactionTestCase):
+    def test_search_endpoint_pages_results(self):
+        for i in range(3):
+            Project.objects.create(name=f'Ponte {i}', site='Coimbra' if i else 'Porto')
+
+        page = self.api.get('/projects/search/?q=ponte&limit=2').json()
+        self.assertEqual((page['total'], page['next_offset'], len(page['results'])), (3, 2, 2))
+        page = self.api.get('/projects/search/?q=ponte&offset=2&limit=2').json()
+        self.assertEqual((page['total'], page['next_offset'], len(page['results'])), (3, None, 1))
+
+        page = self.api.get('/projects/search/?q=porto').json()
+        self.assertEqual([p['name'] for p in page['results']], ['Ponte 0'])
+        self.assertEqual(self.api.get('/projects/search/').status_code, 422)
+
+
+class StartupTests(TestCase):
+    def test_setup_runs_once(self):
+        import re_arqui
+        with patch('django.setup') as setup:
+            re_arqui.setup()
+        setup.assert_not_called()
+
+    def test_entry_points_leave_heavy_modules_to_their_endpoints(self):
+        import subprocess
+        import sys
+
+        code = ("import sys, re_arqui; re_arqui.setup(); import re_arqui.urls, project.api; "
+                "print(' '.join(m for m in ('rest_framework.authtoken.views', 'project.csv_import', "
+                "'project.exports', 'project.photo_import') if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_token_view(self):
+        User.objects.create_user('editor', password='s3cret')
+        client = self.client_class(enforce_csrf_checks=True)
+        response = client.post('/api-token-auth/', {'username': 'editor', 'password': 's3cret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['token'], Token.objects.get(user__username='editor').key)
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='s3cret'))
+        # Cached after the first admin page; don't count it in the first measurement
+        ContentType.objects.get_for_models(Project, Photo)
+
+    def add_photos(self, project, count):
+        Photo.objects.bulk_create([
+            Photo(project=project, title=f'{project.name} {i}', index=i, image=f'project/photos/{project.id}_{i}.jpg',
+                  dominant_color='#785a3c', renditions={'files': [
+                      {'width': width, 'height': width, 'format': 'JPEG', 'name': f'r/{project.id}_{i}_{width}.jpg'}
+                      for width in (960, 480)
+                  ]})
+            for i in range(count)
+        ])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_photo_changelist_query_count_does_not_grow(self):
+        url = reverse('admin:project_photo_changelist')
+        self.add_photos(Project.objects.create(name='Lisboa'), 2)
+        small, _ = self.count_queries(url)
+
+        for i in range(10):
+            self.add_photos(Project.objects.create(name=f'Porto {i}'), 3)
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        # Thumbnails come from the smallest rendition
+        self.assertContains(response, '/media/r/1_0_480.jpg')
+        self.assertNotContains(response, '/media/r/1_0_960.jpg')
+
+    def test_photo_changelist_lists_only_the_selected_project(self):
+        lisboa = Project.objects.create(name='Lisboa')
+        self.add_photos(lisboa, 2)
+        self.add_photos(Project.objects.create(name='Porto'), 2)
+
+        response = self.client.get(reverse('admin:project_photo_changelist'))
+        self.assertNotContains(response, 'project__id__exact=')
+
+        response = self.client.get(reverse('admin:project_photo_changelist'), {'project__id__exact': lisboa.id})
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertContains(response, f'?project__id__exact={lisboa.id}')
+        self.assertNotContains(response, 'Porto 0')
+
+    def test_photo_form_does_not_list_every_project(self):
+        for i in range(5):
+            Project.objects.create(name=f'Porto {i}')
+        self.add_photos(Project.objects.create(name='Lisboa'), 1)
+
+        response = self.client.get(reverse('admin:project_photo_change', args=[Photo.objects.get().id]))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, '>Lisboa</option>')
+        self.assertNotContains(response, 'Porto 0')
+
+    def test_project_changelist_counts_photos(self):
+        url = reverse('admin:project_project_changelist')
+        self.add_photos(Project.objects.create(name='Lisboa'), 2)
+        small, _ = self.count_queries(url)
+
+        for i in range(10):
+            self.add_photos(Project.objects.create(name=f'Porto {i}'), i)
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        counts = {project.name: project.photo_count for project in response.context['cl'].result_list}
+        self.assertEqual((counts['Lisboa'], counts['Porto 0'], counts['Porto 9']), (2, 0, 9))
+
+    def test_project_change_form_pages_photos(self):
+        project = Project.objects.create(name='Lisboa')
+        self.add_photos(project, 3)
+        url = reverse('admin:project_project_change', args=[project.id])
+        small, _ = self.count_queries(url)
+
+        self.add_photos(project, 57)
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(formset.initial_form_count(), 25)
+        self.assertContains(response, 'photos_page=3')
+
+        response = self.client.get(url, {'photos_page': 3})
+        self.assertEqual(response.context['inline_admin_formsets'][0].formset.initial_form_count(), 10)
+
+    def test_project_change_form_saves_a_page(self):
+        project = Project.objects.create(name='Lisboa')
+        self.add_photos(project, 30)
+        url = reverse('admin:project_project_change', args=[project.id])
+        response = self.client.get(url, {'photos_page': 2})
+        formset = response.context['inline_admin_formsets'][0].formset
+
+        data = {'name': 'Lisboa', 'public_private_project': 0}
+        for key, value in formset.management_form.initial.items():
+            data[f'{formset.prefix}-{key}'] = value
+        for i, form in enumerate(formset.initial_forms):
+            data.update({f'{formset.prefix}-{i}-id': form.instance.pk, f'{formset.prefix}-{i}-title': f'Página 2 {i}',
+                         f'{formset.prefix}-{i}-index': form.instance.index})
+        response = self.client.post(f'{url}?photos_page=2', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(project.photo_set.filter(title__startswith='Página 2').count(), 5)
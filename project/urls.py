@@ -6,4 +6,5 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('project/<int:project_id>/', views.project, name='project'),
     path('about/', views.about, name='about'),
+    path('metrics/', views.metrics, name='metrics'),
 ] 
\ No newline at end of file
@@ -1,40 +1,70 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.utils import timezone
-from django.db.models import F, Value, IntegerField, Case, When
+from django.views.decorators.csrf import csrf_exempt
 
+from .auth import get_user_from_token
+from .cache import annotate_project_versions, cached_page, request_content_version
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
 from .models import Project, Photo
 
 # Frontend views
+@cached_page
 def home(request):
     # Order by public_private_project, then by construction_year or project_year
-    projects = Project.objects.annotate(
-        year_for_sorting=Case(
-            When(construction_year__isnull=False, then=F('construction_year')),
-            When(project_year__isnull=False, then=F('project_year')),
-            default=Value(0),
-            output_field=IntegerField(),
-        )
-    ).order_by('public_private_project', 'year_for_sorting')
+    # (stored as sort_year so the ordering comes from project_home_order_idx)
+    projects = Project.objects.with_cover_image().order_by('public_private_project', 'sort_year')
+    # Per-project versions key the cached cards, so only changed cards are re-rendered
+    projects = annotate_project_versions(list(projects), request_content_version(request))
     
     return render(request, 'project/home.html', {
         'projects': projects,
+        # Cards are also keyed by their project's version; the timeout only bounds
+        # how long a card outlives a missed bump
+        'card_cache_timeout': getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24),
         'header_visible': True,
         'now': timezone.now()
     })
 
+@cached_page
 def project(request, project_id):
-    project = get_object_or_404(Project, id=project_id)
-    photos = project.photo_set.all()
+    project = get_object_or_404(Project.objects.with_cover_image(), id=project_id)
+    # Only one page of the gallery is rendered; project.js loads the following
+    # pages from the API as the visitor scrolls or browses in the viewer
+    paginator = Paginator(project.photo_set.order_by('index', 'id'), getattr(settings, 'GALLERY_PAGE_SIZE', 24))
+    photos = paginator.get_page(request.GET.get('page'))
     
     return render(request, 'project/project.html', {
         'project': project,
         'photos': photos,
+        'photos_api_url': f"{getattr(settings, 'FASTAPI_MOUNT_PATH', '/api')}/projects/{project.id}/photos/",
         'header_visible': True,
         'now': timezone.now()
     })
 
+@cached_page
 def about(request):
     return render(request, 'project/about.html', {
         'header_visible': True,
         'now': timezone.now()
     })
+
+def metrics(request):
+    """Request metrics of this process for Prometheus, for staff users and API tokens"""
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        raise Http404("Metrics are disabled")
+    scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+    user = get_user_from_token(key) if scheme in ('Bearer', 'Token') and key else None
+    if not (request.user.is_staff or user):
+        return HttpResponse("Authentication required", status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+@csrf_exempt
+def obtain_auth_token(request, *args, **kwargs):
+    """DRF's token view, imported on the first call"""
+    # rest_framework.authtoken.views pulls in DRF's views, schemas and renderers (~140 ms),
+    # which no other Django page needs
+    from rest_framework.authtoken.views import obtain_auth_token as view
+    return view(request, *args, **kwargs)
@@ -0,0 +1,16 @@
+import os
+
+
+def setup():
+    """
+    Configure Django for modules that can be imported on their own, such as
+    project.api under uvicorn. Only the first call in a process does any work,
+    so importing them after get_wsgi_application()/get_asgi_application() (or
+    from manage.py) doesn't set Django up a second time.
+    """
+    from django.apps import apps
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 're_arqui.settings')
+    if not apps.ready:
+        import django
+        django.setup()
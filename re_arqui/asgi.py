@@ -2,6 +2,10 @@
 ASGI config for re_arqui project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests under FASTAPI_MOUNT_PATH (``/api``) go to the FastAPI app and
+everything else to Django, all in one process:
+
+    uvicorn re_arqui.asgi:application
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +13,23 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 're_arqui.settings')
 
-application = get_asgi_application()
+# Set up Django before importing anything that uses models
+django_application = get_asgi_application()
+
+if settings.FILE_SERVING == 'whitenoise':
+    # Serve static and media files ahead of Django (see project/files.py)
+    from project.files import ASGIFiles
+    django_application = ASGIFiles(django_application)
+else:
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+    django_application = ASGIStaticFilesHandler(django_application)
+
+from project.api import app as fastapi_app  # noqa: E402
+from project.middleware import DjangoMiddleware  # noqa: E402
+
+application = DjangoMiddleware(fastapi_app, django_application)
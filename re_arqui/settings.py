@@ -26,7 +26,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost', 're-arqui.pt', '*.azurewebsites.net',
                  'manuelfelix.eu']
@@ -41,13 +41,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'rest_framework',
     'rest_framework.authtoken',
     'project',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'project.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,7 +61,8 @@ ROOT_URLCONF = 're_arqui.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, timing renders for project.metrics
+        'BACKEND': 'project.metrics.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,12 +84,71 @@ WSGI_APPLICATION = 're_arqui.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The default 'production' profile uses re_arqui.sqlite3 (WAL journal, tuned
+# pragmas, IMMEDIATE transactions and busy retries).
+# DB_PROFILE=basic uses Django's stock SQLite backend and settings.
+#
+# Connections are closed after each request unless DB_CONN_MAX_AGE is set. Under
+# ASGI every request's sync code runs in a new thread, so persistent connections
+# would never be reused and would pile up; re_arqui/wsgi.py enables them (600s)
+# for the WSGI server, whose threads serve request after request.
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'production')
+
+if DB_PROFILE == 'basic':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 're_arqui.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a connection waits for a lock before failing with "database is locked"
+                'timeout': 10,
+            },
+        }
+    }
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,  # KiB
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
+SQLITE_BUSY_RETRIES = 5
+SQLITE_BUSY_BACKOFF = 0.05  # seconds, doubled on every retry
+
+
+# Cache
+# The public pages are cached by content version (see project/cache.py). Use
+# CACHE_BACKEND=file to share the cache, and so invalidations, between the
+# Django and FastAPI processes; run_prod.py does when it runs several workers.
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+if os.environ.get('CACHE_BACKEND') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 2000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 2000},
+        }
+    }
 
 
 # Password validation
@@ -127,12 +187,39 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  # Development static files
+# The collected files are committed. Re-collect with `collectstatic --clear` so the
+# hashed copies of replaced files don't linger next to the new ones.
 # STATICFILES_DIRS is not needed as static files are in project/static/
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Development media files
 
+# FILE_SERVING=whitenoise serves static and media files with project.files
+# (WhiteNoise): collectstatic writes content-hashed names with gzip/brotli
+# copies and photos are content-addressed, so both get year-long immutable
+# Cache-Control (hashed static URLs are only used with DEBUG off). Range
+# requests and conditional requests are supported. FILE_SERVING=django serves
+# them through Django views (dj-static and django.conf.urls.static) as before.
+FILE_SERVING = os.environ.get('FILE_SERVING', 'whitenoise')
+
+if FILE_SERVING == 'whitenoise':
+    MIDDLEWARE.insert(1, 'project.files.FilesMiddleware')
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+    }
+
+# Cache lifetime of files without a content hash in their name
+WHITENOISE_MAX_AGE = 0 if DEBUG else 60 * 60
+
+# Widths (px) of the resized copies generated for every uploaded photo
+PHOTO_RENDITION_WIDTHS = [480, 960, 1600]
+PHOTO_RENDITION_QUALITY = 82
+
+# Photos rendered per page of a project gallery; the rest are loaded on scroll
+GALLERY_PAGE_SIZE = 24
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -149,4 +236,19 @@ REST_FRAMEWORK = {
 }
 
 # FastAPI settings
-FASTAPI_MOUNT_PATH = '/api'
\ No newline at end of file
+FASTAPI_MOUNT_PATH = '/api'
+
+# In-process cache of resolved API tokens (seconds / entries)
+API_TOKEN_CACHE_TTL = 300
+API_TOKEN_CACHE_SIZE = 1024
+
+# Threads running the API's synchronous ORM/file work (0: asgiref's single
+# thread-sensitive executor)
+API_SYNC_THREADS = int(os.environ.get('API_SYNC_THREADS', 0))
+
+# Per-request timing, query and size metrics: Server-Timing headers and
+# Prometheus histograms at /metrics/ and /api/metrics/ (see project/metrics.py)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+
+# Threads used for background API jobs such as photo batches (None: one per CPU, up to 8)
+BACKGROUND_WORKERS = None
\ No newline at end of file
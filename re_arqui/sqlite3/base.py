@@ -0,0 +1,63 @@
+"""
+SQLite backend tuned for concurrent Django and FastAPI access.
+
+On top of Django's sqlite3 backend it:
+
+- applies the SQLITE_PRAGMAS setting (WAL journal, synchronous, cache and mmap
+  sizes...) to every new connection;
+- starts transactions with BEGIN IMMEDIATE, so a transaction takes the write
+  lock up front and waits on the busy timeout instead of failing with
+  "database is locked" when it later tries to write;
+- retries statements that still fail because the database is busy, with
+  exponential backoff, but only outside transactions, where retrying a
+  statement is safe.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+Database = base.Database
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+
+def is_busy_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    def execute(self, query, params=None):
+        retries = getattr(settings, 'SQLITE_BUSY_RETRIES', 5)
+        delay = getattr(settings, 'SQLITE_BUSY_BACKOFF', 0.05)
+        attempt = 0
+        while True:
+            in_transaction = self.connection.in_transaction
+            try:
+                return super().execute(query, params)
+            except Database.OperationalError as e:
+                if in_transaction or attempt >= retries or not is_busy_error(e):
+                    raise
+                time.sleep(delay * (2 ** attempt) * (1 + random.random()))
+                attempt += 1
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS).items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=SQLiteCursorWrapper)
+
+    def _start_transaction_under_autocommit(self):
+        # Take the write lock now rather than on the first write, where SQLite
+        # can't wait for it without risking a deadlock
+        self.cursor().execute("BEGIN IMMEDIATE")
@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework.authtoken.views import obtain_auth_token
+from project.views import obtain_auth_token
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,5 +26,7 @@ urlpatterns = [
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
 ]
 
-# Always serve media files - this works in production on Azure when DEBUG is True
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# With FILE_SERVING=whitenoise media files are served by project.files.FilesMiddleware
+if settings.FILE_SERVING == 'django':
+    # Serve media files - this works in production on Azure when DEBUG is True
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
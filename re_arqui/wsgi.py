@@ -9,10 +9,17 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
-from dj_static import Cling
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 're_arqui.settings')
+# Worker threads are long-lived here, so their connections are reused across requests
+os.environ.setdefault('DB_CONN_MAX_AGE', '600')
+
+application = get_wsgi_application()
 
-application = Cling(get_wsgi_application())
+# With FILE_SERVING=whitenoise static and media files are served by
+# project.files.FilesMiddleware inside Django
+if settings.FILE_SERVING == 'django':
+    from dj_static import Cling
+    application = Cling(application)
@@ -24,12 +24,7 @@ def run_fastapi():
     # Set environment variable for Django settings
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "re_arqui.settings")
     
-    # Import FastAPI app after setting the environment variable
-    from project.api import app
-    
-    import uvicorn
-    
-    # Run FastAPI with uvicorn in a separate process
+    # Run FastAPI with uvicorn in a separate process; the app is only imported there
     fastapi_process = subprocess.Popen(
         [sys.executable, '-m', 'uvicorn', 'project.api:app', '--host', '127.0.0.1', '--port', '8001'],
         stdout=subprocess.PIPE,
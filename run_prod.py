@@ -0,0 +1,182 @@
+"""
+Production server: the combined Django + FastAPI application (re_arqui.asgi)
+under gunicorn, with uvicorn workers.
+
+The application is loaded once in the gunicorn master (preload), which also
+does the work Django otherwise leaves to the first request of every worker:
+the URLconf, the template libraries and the site's templates. Workers are
+forked from it already warm and share that memory copy-on-write.
+
+- Workers: --workers, or WEB_CONCURRENCY, or (2 x CPUs) + 1.
+- Recycling: each worker exits gracefully after --max-requests requests
+  (plus a random --max-requests-jitter, so they don't all restart at once)
+  and the master forks a fresh one, capping memory growth.
+- Shared state: with more than one worker, or workers replaced by recycling,
+  the page cache and the batch job status need a cache every worker sees, so
+  CACHE_BACKEND defaults to 'file' (see re_arqui/settings.py).
+- Background jobs: photo batches run in the worker that accepted them, after
+  its response. A worker that is recycled, reloaded or stopped stops accepting
+  requests but keeps its heartbeat and waits up to --graceful-timeout for its
+  jobs before exiting; jobs still running after that are lost (see
+  project/jobs.py). On a shutdown or --upgrade the master also kills workers
+  still busy after --graceful-timeout, so keep it above the longest batch.
+
+Reloads, given the master's pid (written to --pid):
+
+    kill -HUP <pid>      New workers from the loaded application, re-reading the options;
+                         the old ones finish their requests first. Code changes need:
+    python run_prod.py --upgrade
+                         Zero-downtime code reload: starts a new master with the current
+                         code on the same socket (USR2), then stops the old one gracefully
+                         (TERM). If the new code fails to load, the old master keeps serving.
+    kill -TERM <pid>     Graceful shutdown.
+
+Usage: python run_prod.py [--bind 0.0.0.0:8000] [--workers N] [--max-requests 1000]
+                          [--max-requests-jitter 100] [--timeout 30] [--graceful-timeout 120]
+                          [--pid run_prod.pid] [--access-log] [--upgrade]
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_workers():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return int(os.environ.get('WEB_CONCURRENCY', 2 * cpus + 1))
+
+
+def warm_up():
+    """Load what Django otherwise loads on the first request, so forked workers share it"""
+    from django.apps import apps
+    from django.conf import settings
+    from django.db import connections
+    from django.template import engines
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+    from django.utils import translation
+
+    get_resolver().reverse_dict  # populates the resolver
+    # Loads the translation catalogs
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.deactivate()
+    # Instantiating the engines imports every template tag library
+    engines.all()
+    templates = os.path.join(apps.get_app_config('project').path, 'templates')
+    for directory, _, files in os.walk(templates):
+        for name in files:
+            if name.endswith('.html'):
+                get_template(os.path.relpath(os.path.join(directory, name), templates))
+
+    # Connections must not be shared with the forked workers
+    connections.close_all()
+
+
+class Worker(UvicornWorker):
+    """Uvicorn worker that lets its background jobs complete before exiting"""
+
+    def run(self):
+        super().run()
+        from project.jobs import wait_for_jobs
+
+        # Keep heartbeating, or the master kills the worker as stuck after --timeout
+        wait_for_jobs(self.cfg.graceful_timeout, tick=self.notify)
+
+
+class Server(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from re_arqui.asgi import application
+
+        warm_up()
+        # Keep the loaded objects out of the collector's generations, so collections in the
+        # workers don't write to (and un-share) the pages inherited from the master
+        gc.freeze()
+        return application
+
+
+def upgrade(pidfile, timeout):
+    """Replace the running master by one with the current code; see the module docstring"""
+    with open(pidfile) as f:
+        old_pid = int(f.read())
+    os.kill(old_pid, signal.SIGUSR2)
+
+    # The new master loads the application, then writes its pid to <pidfile>.2 (renamed
+    # to <pidfile> once the old master is gone) and forks its workers
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.5)
+        try:
+            with open(f'{pidfile}.2') as f:
+                new_pid = int(f.read())
+        except (FileNotFoundError, ValueError):
+            continue
+        time.sleep(2)
+        try:
+            os.kill(new_pid, 0)
+        except ProcessLookupError:
+            break
+        os.kill(old_pid, signal.SIGTERM)
+        print(f"Upgraded: master {old_pid} replaced by {new_pid}")
+        return True
+    print(f"The new master did not start; master {old_pid} keeps serving", file=sys.stderr)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('MAX_REQUESTS', 1000)),
+                        help="Requests after which a worker is replaced (0 disables)")
+    parser.add_argument('--max-requests-jitter', type=int,
+                        default=int(os.environ.get('MAX_REQUESTS_JITTER', 100)))
+    parser.add_argument('--timeout', type=int, default=30, help="Seconds before a silent worker is killed")
+    parser.add_argument('--graceful-timeout', type=int, default=120,
+                        help="Seconds workers get to finish their requests and background jobs on restarts")
+    parser.add_argument('--pid', default=os.path.join(BASE_DIR, 'run_prod.pid'))
+    parser.add_argument('--access-log', action='store_true', help="Log requests to stdout")
+    parser.add_argument('--upgrade', action='store_true', help="Reload the running server with the current code")
+    args = parser.parse_args()
+
+    if args.upgrade:
+        sys.exit(0 if upgrade(args.pid, args.timeout + 30) else 1)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 're_arqui.settings')
+    if args.workers > 1 or args.max_requests:
+        os.environ.setdefault('CACHE_BACKEND', 'file')
+
+    Server({
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'run_prod.Worker',
+        'preload_app': True,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'pidfile': args.pid,
+        'accesslog': '-' if args.access_log else None,
+        'chdir': BASE_DIR,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
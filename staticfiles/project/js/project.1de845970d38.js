@@ -0,0 +1,273 @@
+/**
+ * Portfolio/Project detail functionality for RE-ARQUI
+ */
+document.addEventListener('DOMContentLoaded', function() {
+  // DOM elements
+  const viewer = document.getElementById('fullscreen-viewer');
+  const image = document.getElementById('fullscreen-image');
+  const caption = document.getElementById('fullscreen-caption');
+  const closeBtn = document.querySelector('.fullscreen-close');
+  const prevBtn = document.querySelector('.fullscreen-prev');
+  const nextBtn = document.querySelector('.fullscreen-next');
+  const gallery = document.querySelector('.gallery-grid');
+  const moreLink = document.querySelector('.gallery-next');
+  const header = document.querySelector('header');
+  
+  // Gallery state
+  let currentIndex = 0;
+  let images = [];
+  let lastScrollTop = 0;
+  
+  // Only the first page of photos is rendered; the rest come from the API
+  const photosUrl = gallery ? gallery.dataset.photosUrl : null;
+  const pageSize = gallery ? parseInt(gallery.dataset.pageSize, 10) : 0;
+  const total = gallery ? parseInt(gallery.dataset.total, 10) : 0;
+  let nextOffset = gallery ? parseInt(gallery.dataset.nextOffset, 10) : 0;
+  let loading = null;
+  const sizes = '(max-width: 768px) 100vw, 50vw';
+  const sourceFormats = [['AVIF', 'image/avif'], ['WEBP', 'image/webp']];
+  
+  function hasMore() {
+    return photosUrl && nextOffset < total;
+  }
+  
+  function srcsetFor(renditions, format) {
+    return renditions
+      .filter(rendition => rendition.format === format)
+      .map(rendition => `${rendition.url} ${rendition.width}w`)
+      .join(', ');
+  }
+  
+  // Same markup as includes/picture.html
+  function buildGalleryItem(photo) {
+    const item = document.createElement('div');
+    item.className = 'gallery-item';
+    const picture = document.createElement('picture');
+    
+    sourceFormats.forEach(([format, type]) => {
+      const srcset = srcsetFor(photo.renditions, format);
+      if (!srcset) return;
+      const source = document.createElement('source');
+      source.type = type;
+      source.srcset = srcset;
+      source.sizes = sizes;
+      picture.appendChild(source);
+    });
+    
+    const img = document.createElement('img');
+    img.src = photo.image_url;
+    if (photo.srcset) {
+      img.srcset = photo.srcset;
+      img.sizes = sizes;
+    }
+    if (photo.width) {
+      img.width = photo.width;
+      img.height = photo.height;
+    }
+    img.loading = 'lazy';
+    img.decoding = 'async';
+    // Paint the photo's main colour until it loads
+    if (photo.dominant_color) img.style.backgroundColor = photo.dominant_color;
+    if (photo.blurhash) img.dataset.blurhash = photo.blurhash;
+    img.alt = photo.title;
+    img.className = 'gallery-image';
+    img.dataset.photoId = photo.id;
+    img.dataset.fullSrc = photo.image_url;
+    
+    picture.appendChild(img);
+    item.appendChild(picture);
+    return item;
+  }
+  
+  // Fetch and append the next page of photos; resolves once it's in the gallery
+  function loadMore() {
+    if (!hasMore()) return Promise.resolve();
+    if (loading) return loading;
+    
+    loading = fetch(`${photosUrl}?offset=${nextOffset}&limit=${pageSize}`)
+      .then(response => {
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.json();
+      })
+      .then(photos => {
+        photos.forEach(photo => {
+          const item = buildGalleryItem(photo);
+          gallery.appendChild(item);
+          addImage(item.querySelector('img'));
+        });
+        nextOffset = photos.length ? nextOffset + photos.length : total;
+        if (!hasMore()) {
+          if (moreLink) moreLink.remove();
+          if (observer) observer.disconnect();
+        } else if (observer) {
+          // Observe again so a link that is still in view loads another page
+          observer.unobserve(moreLink);
+          observer.observe(moreLink);
+        }
+      })
+      .catch(() => {
+        // Leave the "More photos" link for normal page navigation
+        nextOffset = total;
+        if (observer) observer.disconnect();
+      })
+      .finally(() => {
+        loading = null;
+      });
+    return loading;
+  }
+  
+  // Show specific image in fullscreen
+  function showImage(index) {
+    if (images.length === 0) return;
+    
+    // Past the last loaded photo: load the next page before wrapping around
+    if (index >= images.length && hasMore()) {
+      loadMore().then(() => showImage(index));
+      return;
+    }
+    
+    // Ensure index is within bounds
+    currentIndex = ((index % images.length) + images.length) % images.length;
+    const img = images[currentIndex];
+    
+    // Update image and caption (always the original, not a srcset rendition)
+    image.src = img.dataset.fullSrc || img.src;
+    image.alt = img.alt || '';
+    caption.textContent = img.alt || '';
+    
+    // Preload adjacent images, and the next page when nearing the end
+    if (images.length > 1) {
+      const nextImg = new Image();
+      const next = images[(currentIndex + 1) % images.length];
+      nextImg.src = next.dataset.fullSrc || next.src;
+      
+      const prevImg = new Image();
+      const prev = images[(currentIndex - 1 + images.length) % images.length];
+      prevImg.src = prev.dataset.fullSrc || prev.src;
+    }
+    if (currentIndex >= images.length - 2) loadMore();
+  }
+  
+  // Open fullscreen viewer
+  function addImage(img) {
+    const index = images.length;
+    images.push(img);
+    img.addEventListener('click', () => {
+      currentIndex = index;
+      showImage(currentIndex);
+      viewer.classList.add('active');
+      document.body.style.overflow = 'hidden';
+    });
+  }
+  document.querySelectorAll('.gallery-image').forEach(addImage);
+  
+  // Load the next page as the "More photos" link scrolls into view
+  let observer = null;
+  if (moreLink && hasMore() && 'IntersectionObserver' in window) {
+    observer = new IntersectionObserver(entries => {
+      if (entries.some(entry => entry.isIntersecting)) loadMore();
+    }, { rootMargin: '600px 0px' });
+    observer.observe(moreLink);
+  }
+  
+  // Navigate to previous image
+  function prevImage() {
+    showImage(currentIndex - 1);
+  }
+  
+  // Navigate to next image
+  function nextImage() {
+    showImage(currentIndex + 1);
+  }
+  
+  // Close the viewer
+  function closeViewer() {
+    viewer.classList.remove('active');
+    document.body.style.overflow = '';
+  }
+  
+  // Event Listeners
+  
+  // Close button click
+  if (closeBtn) {
+    closeBtn.addEventListener('click', (e) => {
+      e.stopPropagation();
+      closeViewer();
+    });
+  }
+  
+  // Previous button click
+  if (prevBtn) {
+    prevBtn.addEventListener('click', (e) => {
+      e.stopPropagation();
+      prevImage();
+    });
+  }
+  
+  // Next button click
+  if (nextBtn) {
+    nextBtn.addEventListener('click', (e) => {
+      e.stopPropagation();
+      nextImage();
+    });
+  }
+  
+  // Close when clicking on the background (not the image)
+  viewer.addEventListener('click', function(event) {
+    // This is the key fix: check if the clicked element is the viewer itself
+    // and not any of its children or descendants
+    if (event.target === viewer) {
+      closeViewer();
+    }
+  });
+  
+  // Make sure clicks on the image don't close the viewer
+  image.addEventListener('click', function(event) {
+    event.stopPropagation();
+  });
+  
+  // Make sure clicks on the navigation buttons don't close the viewer
+  if (prevBtn) prevBtn.addEventListener('click', function(event) { 
+    event.stopPropagation(); 
+  });
+  
+  if (nextBtn) nextBtn.addEventListener('click', function(event) {
+    event.stopPropagation();
+  });
+  
+  // Make sure clicks on the caption don't close the viewer
+  if (caption) caption.addEventListener('click', function(event) {
+    event.stopPropagation();
+  });
+  
+  // Keyboard navigation
+  document.addEventListener('keydown', (e) => {
+    // Only handle keyboard events when viewer is active
+    if (!viewer.classList.contains('active')) return;
+    
+    switch (e.key) {
+      case 'ArrowLeft':
+        prevImage();
+        break;
+      case 'ArrowRight':
+        nextImage();
+        break;
+      case 'Escape':
+        closeViewer();
+        break;
+    }
+  });
+  
+  // Header fade effect on scroll
+  window.addEventListener('scroll', () => {
+    const scrollTop = window.pageYOffset || document.documentElement.scrollTop;
+    
+    if (scrollTop > 100) {
+      header.style.opacity = scrollTop > lastScrollTop ? '0.5' : '1';
+    } else {
+      header.style.opacity = '1';
+    }
+    
+    lastScrollTop = scrollTop;
+  });
+});
\ No newline at end of file